@@ -0,0 +1,91 @@
+"""
+Compares the CPU cost of the old and the new download receive loop.
+
+The old loop pulls 1 KB chunks from response.iter_content and does the write, the progress
+emit and the speed bookkeeping per chunk. The new loop reads into a pooled 1 MB buffer with
+response.raw.readinto and does the same work once per buffer.
+The body comes from memory, so the numbers are pure Python overhead per GB received.
+
+Usage: python benchmarks/receive_path.py [size in MB]
+"""
+import io, os, sys, time
+import requests
+from urllib3 import HTTPResponse
+
+CHUNK_SIZE = 1024
+BUFFER_SIZE = 1024 * 1024
+
+class ZeroStream(io.RawIOBase):
+    def __init__(self, size):
+        self.remaining = size
+        self._zeros = memoryview(bytes(BUFFER_SIZE))
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        count = min(len(b), self.remaining, BUFFER_SIZE)
+        b[:count] = self._zeros[:count]
+        self.remaining -= count
+        return count
+
+def make_response(size):
+    response = requests.Response()
+    response.status_code = 206
+    response.raw = HTTPResponse(body=ZeroStream(size), headers={"Content-Length": str(size)}, preload_content=False, decode_content=False)
+    return response
+
+class Bookkeeping:
+    """Stands in for the progress emit and calculate_speed of DownloadThread."""
+    def __init__(self, total_size):
+        self.total_size = total_size
+        self.total_downloaded = 0
+        self.last_report_time = time.time()
+        self.last_percent = 0
+
+    def emit(self, value):
+        self.last_percent = value
+
+    def calculate_speed(self):
+        if time.time() - self.last_report_time >= 1:
+            self.last_report_time = time.time()
+
+def old_loop(response, out, stats):
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if not chunk:
+            continue
+        out.write(chunk)
+        stats.total_downloaded += len(chunk)
+        stats.emit(int(stats.total_downloaded / stats.total_size * 100))
+        stats.calculate_speed()
+
+def new_loop(response, out, stats):
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        received = response.raw.readinto(view)
+        if not received:
+            break
+        out.write(view[:received])
+        stats.total_downloaded += received
+        stats.emit(int(stats.total_downloaded / stats.total_size * 100))
+        stats.calculate_speed()
+
+def measure(loop, size):
+    stats = Bookkeeping(size)
+    response = make_response(size)
+    with open(os.devnull, "wb") as out:
+        start = time.process_time()
+        loop(response, out, stats)
+        elapsed = time.process_time() - start
+    assert stats.total_downloaded == size
+    return elapsed * (1024**3 / size)
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) * 1024**2 if len(sys.argv) > 1 else 512 * 1024**2
+    before = measure(old_loop, size)
+    after = measure(new_loop, size)
+    print(f"Received {size / 1024**2:.0f} MB per run")
+    print(f"iter_content 1 KB chunks : {before:.3f} s CPU per GB")
+    print(f"readinto 1 MB buffers    : {after:.3f} s CPU per GB")
+    print(f"Speedup                  : {before / after:.1f}x")
@@ -106,13 +106,13 @@ class TabWidget(QWidget):
         self.tabs.currentChanged.connect(self._on_tab_switch)
     
     def pause_callback(self):
-        self.download_manager.download_thread.pause()
+        self.download_manager.pause()
     
     def stop_callback(self):
-        self.download_manager.download_thread.stop()
+        self.download_manager.stop()
     
     def resume_callback(self):
-        self.download_manager.download_thread.resume()
+        self.download_manager.resume()
     
     def update_callback(self, url):
         self.download_manager.start(url)
@@ -1,20 +1,24 @@
-from PyQt5.QtCore import Qt,  QThread, pyqtSignal
+from PyQt5.QtCore import Qt,  QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIntValidator
 from PyQt5.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QLineEdit, QLabel, QPushButton, 
-    QWidget, QProgressBar, QListWidget, QFrame, QMenu, QAction, QMessageBox
+    QWidget, QProgressBar, QListWidget, QListWidgetItem, QFrame, QMenu, QAction, QMessageBox
 )
-import os, time, json, requests, logging, string, re, random, ctypes, urllib.parse, threading, subprocess, shutil, glob
+import os, errno, time, json, requests, logging, string, re, random, ctypes, urllib.parse, threading, shutil, glob
+from collections import deque
 # from playwright.sync_api import sync_playwright  # Removed
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION, FIRST_COMPLETED
 from bs4 import BeautifulSoup
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 
 from .scraper import UniversalScraper
 from .utility.utility_functions import save_json, load_json, hash_url, get_name_from_url, _get_version_steamrip, _game_naming
 from .utility.utility_classes import Payload, Header, UserConfig
-from .utility.utility_vars import CONFIG_FOLDER, CACHE_FOLDER, APPDATA_CACHE_PATH
+from .utility.download_classes import ArchiveFile, DownloadJournal, BlockHashes, SegmentScheduler, ConnectionController, ConnectionBudget, SessionPool, RetryPolicy, TokenBucket, BufferPool, DiskWriter, LinkCache, ProviderHealth, DiskSpaceLedger, DownloadSource, provider_host, probe_server, measure_throughput, hash_remote_range, retry_after, MIN_SPLIT_BYTES, LINK_CACHE_TTL, REFRESH_RETRY_INTERVAL, EXTRACT_FACTOR
+from .utility.utility_vars import CONFIG_FOLDER, CACHE_FOLDER
+from .utility.extract_classes import EXTRACTORS, find_extractor, validate_archive
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -466,79 +470,353 @@ downloader_data = {
                 "formaturl": "https://gofile.io/d/{detected_link}",
                 "priority": 1,
                 "downloader": DirectLinkDownloader.gofile,
-                "enabled": True
+                "enabled": True,
+                "connections": 2,
+                "max_connections": 4,
+                "link_ttl": 6 * 60 * 60
             },
             "filecrypt": {
                 "pattern": r'<a\s+href="\/\/(?:\w+\.)?filecrypt\.\w+\/Container\/([A-Za-z0-9]+)"',
                 "formaturl": "https://www.filecrypt.cc/Container/{detected_link}",
                 "priority": 2,
                 "downloader": DirectLinkDownloader.filecrypt,
-                "enabled": False
+                "enabled": False,
+                "connections": 2,
+                "max_connections": 8,
+                "link_ttl": 60 * 60
             },
             "buzzheavier": {
                 "pattern": r'<a\s+href="\/\/buzzheavier\.com\/([^\"]+)"',
                 "formaturl": "https://buzzheavier.com/{detected_link}",
                 "priority": 3,
                 "downloader": DirectLinkDownloader.buzzheavier,
-                "enabled": True
+                "enabled": True,
+                "connections": 5,
+                "max_connections": 16,
+                "link_ttl": 60 * 60
             },
             "fichier": { #TODO: PATCH BUG -> DOES NOT WORK ENABLE TRY -> Miside
                 "pattern": r'1fichier\.com/\?([^\"]+)',
                 "formaturl": "https://1fichier.com/?{detected_link}",
                 "priority": 5,
                 "downloader": DirectLinkDownloader.ficher,
-                "enabled": True
+                "enabled": True,
+                "connections": 1,
+                "max_connections": 1,
+                "link_ttl": 2 * 60 * 60
             },
             "datanode": {
                 "pattern": r'<a\s+href="\/\/datanodes\.to\/([^\"]+)"',
                 "formaturl": "https://datanodes.to/{detected_link}",
                 "priority": 4,
                 "downloader": DirectLinkDownloader.datanode,
-                "enabled": True
+                "enabled": True,
+                "connections": 2,
+                "max_connections": 8,
+                "link_ttl": 60 * 60
             },
             "megadb": {
                 "pattern": r'<a\s+href="\/\/megadb\.net\/([^\"]+)"',
                 "formaturl": "https://megadb.net/{detected_link}",
                 "priority": 6,
                 "downloader": DirectLinkDownloader.megadb,
-                "enabled": True
+                "enabled": True,
+                "connections": 4,
+                "max_connections": 16,
+                "link_ttl": 4 * 60 * 60
             },
         },
         "method": Downloader.steamrip,
         "compression": "rar",
     }
 
-def _get_best_downloader(urls: dict, ignore:str = ""):
-    __best_downloader, __best_downloader_key = None, None
+DEFAULT_EXPECTED_SIZE = 8 * 1024**3
+
+def _expected_size(url):
+    """Archive size known from an earlier attempt, otherwise a typical game size."""
+    cache_path = os.path.join(os.getcwd(), "DownloadCache")
+    try:
+        size = load_json(os.path.join(cache_path, f"{hash_url(url)}.journal.json")).get("total_size")
+    except (ValueError, OSError):
+        size = None
+    return size or BlockHashes.stored_total_size(os.path.join(cache_path, f"{hash_url(url)}.blocks")) or DEFAULT_EXPECTED_SIZE
+
+def _rank_downloaders(urls: dict, size, exclude=()):
+    """Enabled providers with a link, fastest expected time-to-complete first, the static priority breaks ties."""
+    health = ProviderHealth()
+    ranking = []
     
     for key, download_link in urls.items():
-        
-        if key==ignore:
+        if key in exclude or download_link is None:
             continue
         
         if not downloader_data["provider"][key]["enabled"]:
             logging.warning(f"Downloader:main Provider: {key} is currently disabled")
             continue
         
-        if download_link != None:
-            if __best_downloader == None:
-                
-                __best_downloader = downloader_data["provider"][key]
-                __best_downloader_key = key
-                
-                continue
-            
-            if downloader_data["provider"][key]["priority"] < __best_downloader["priority"]:
-                __best_downloader = downloader_data["provider"][key]
-                __best_downloader_key = key
+        ranking.append((health.expected_time(key, size), downloader_data["provider"][key]["priority"], key))
+    
+    ranking.sort()
+    logging.info(f"Downloader: Provider ranking for {size / 1024**3:.2f} GB: {[(key, int(seconds)) for seconds, _, key in ranking]}")
+    return [key for _, _, key in ranking]
+
+class ResolvedDownload:
+    """Direct link of one queue item, together with the provider links it was picked from."""
+    def __init__(self, provider_key, request, links, server_info=None, version=None):
+        self.provider_key = provider_key
+        self.request = request
+        self.links = links
+        # Page version the link was resolved for, None when it is unknown
+        self.version = version
+        # Set when the link was already probed, run() then skips its own probe
+        self.server_info = server_info
+        self.resolved_at = time.time()
+
+def _request_parts(provider_key, request):
+    """Headers, payload and session to send with a direct link, megadb links are fetched bare."""
+    if provider_key == "megadb":
+        return None, None, None
+    return request["headers"], request["payload"], request.get("session", None)
+
+def _cached_download(url, link_cache, exclude=(), version=None):
+    """Best ranked cached direct link of url that still answers a range probe, dead entries are dropped."""
+    page_hash = hash_url(url)
+    for key in _rank_downloaders({key: True for key in downloader_data["provider"]}, _expected_size(url), exclude):
+        entry = link_cache.get(page_hash, key, downloader_data["provider"][key].get("link_ttl", LINK_CACHE_TTL), version)
+        if entry is None:
+            continue
+        
+        request = LinkCache.request_from(entry)
+        try:
+            server_info = probe_server(request["url"], request["headers"], request["payload"], request.get("session"))
+        except requests.exceptions.RequestException as e:
+            logging.info(f"Cached {key} link of {url} is unreachable: {e}")
+            server_info = None
+        
+        if server_info is not None and server_info.range_status in (200, 206) and server_info.total_size > 0:
+            logging.info(f"Downloader: Reusing cached {key} link resolved {int(time.time() - entry['resolved_at'])}s ago")
+            return ResolvedDownload(key, request, entry["links"], server_info, version)
+        
+        logging.info(f"Cached {key} link of {url} expired, dropping it.")
+        link_cache.discard(page_hash, key)
+    return None
+
+def resolve_download(url, scraper, link_cache=None, exclude=(), version=None):
+    """
+    Turns a steamrip page into a direct link, walking down the provider ranking until a resolver succeeds.
+    A live cached link skips the page scrape and the resolvers, fresh links are cached for the next start.
+    With a page version only cached links resolved for that version are reused.
+    """
+    if link_cache is not None:
+        resolved = _cached_download(url, link_cache, exclude, version)
+        if resolved is not None:
+            return resolved
     
-    return __best_downloader, __best_downloader_key
+    __links, name = Downloader.steamrip(url, downloader_data, scraper)
+    for key in _rank_downloaders(__links, _expected_size(url), exclude):
+        logging.info(f"Downloader: Trying downloader: {key}")
+
+        resolved = _resolve_provider(url, key, __links, link_cache, version)
+        if resolved is not None:
+            return resolved
+
+    logging.error("Download failed: Could not find a downloader.")
+    return None
+
+def _resolve_provider(url, key, links, link_cache=None, version=None):
+    """Runs the resolver of one provider and caches its direct link, None when it fails."""
+    error = {
+        -1: "1Ficher on cooldown"
+    }
+
+    start_time = time.time()
+    __download_request = downloader_data["provider"][key]["downloader"](links[key])
+    success = isinstance(__download_request, dict) and bool(__download_request.get("url"))
+    ProviderHealth().record_resolve(key, time.time() - start_time, success)
+
+    if not success:
+        logging.error(f"Downloader:{key} failed: {error.get(__download_request, __download_request) if isinstance(__download_request, int) else __download_request}")
+        return None
+
+    if link_cache is not None:
+        link_cache.store(hash_url(url), key, __download_request, links, version)
+    return ResolvedDownload(key, __download_request, links, version=version)
+
+RACE_CONTENDERS = 2
+RACE_SECONDS = 4
+RACE_GRACE = 20
+RACE_MIN_SIZE = 2 * 1024**3
+
+def _race_contender(key, links, cancel, version=None):
+    """Resolves one provider, probes its link and measures a short transfer. Returns (resolved, bytes/s) or None."""
+    start_time = time.time()
+    request = downloader_data["provider"][key]["downloader"](links[key])
+    success = isinstance(request, dict) and bool(request.get("url"))
+    ProviderHealth().record_resolve(key, time.time() - start_time, success)
+    if not success or cancel.is_set():
+        return None
+    
+    headers, payload, session = _request_parts(key, request)
+    server_info = probe_server(request["url"], headers, payload, session)
+    if server_info.total_size <= 0 or cancel.is_set():
+        return None
+    
+    speed = measure_throughput(request["url"], headers, payload, session, RACE_SECONDS)
+    logging.info(f"Downloader:race {key} ready after {time.time() - start_time:.1f}s, measured {_format_speed(speed)}")
+    return ResolvedDownload(key, request, links, server_info, version), speed
+
+def race_download(url, scraper, link_cache=None, exclude=(), version=None):
+    """
+    Resolves the best ranked providers in parallel and measures a short transfer on each, the fastest one wins.
+    Contenders that are still resolving RACE_GRACE seconds after the first result lose; their resolvers can not
+    be interrupted, so they are abandoned and skip their probe and transfer once they return.
+    """
+    if link_cache is not None:
+        resolved = _cached_download(url, link_cache, exclude, version)
+        if resolved is not None:
+            return resolved
+    
+    __links, name = Downloader.steamrip(url, downloader_data, scraper)
+    contenders = _rank_downloaders(__links, _expected_size(url), exclude)[:RACE_CONTENDERS]
+    if not contenders:
+        logging.error("Download failed: Could not find a downloader.")
+        return None
+    
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(contenders), thread_name_prefix="DL_Race")
+    pending = {executor.submit(_race_contender, key, __links, cancel, version) for key in contenders}
+    results, deadline = [], None
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.warning(f"Downloader:race contender failed: {e}")
+                    result = None
+                if result is not None:
+                    results.append(result)
+                    deadline = deadline or time.time() + RACE_GRACE
+    finally:
+        cancel.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    if not results:
+        logging.warning(f"Downloader:race no contender of {contenders} delivered, walking down the ranking.")
+        return resolve_download(url, scraper, link_cache, set(exclude) | set(contenders), version)
+    
+    if link_cache is not None:
+        for resolved, _ in results:
+            link_cache.store(hash_url(url), resolved.provider_key, resolved.request, __links, version)
+    
+    winner, speed = max(results, key=lambda result: result[1])
+    logging.info(f"Downloader:race {winner.provider_key} wins with {_format_speed(speed)} against {[result[0].provider_key for result in results]}")
+    return winner
+
+PREFETCH_LOOKAHEAD = 2
+PREFETCH_MAX_AGE = 15 * 60
+PREFETCH_RETRY_INTERVAL = 5 * 60
+
+class LinkPrefetcher:
+    """
+    Resolves the direct links of the next queue items in the background while the current ones download,
+    so their DownloadThread starts transferring right away. Results older than PREFETCH_MAX_AGE are dropped,
+    since the direct links of most providers expire. A failed resolution is only tried again after
+    PREFETCH_RETRY_INTERVAL, the DownloadThread of the item resolves it itself when it starts earlier.
+    """
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.link_cache = LinkCache()
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_LOOKAHEAD, thread_name_prefix="DL_Prefetch")
+        self._pending = {}
+        self._submitted = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, urls):
+        """Makes sure exactly the given urls are resolved ahead, resolutions of other urls are abandoned."""
+        with self._lock:
+            for url in list(self._pending):
+                if url not in urls:
+                    self._pending.pop(url).cancel()
+                    self._submitted.pop(url, None)
+            
+            for url in urls:
+                future = self._pending.get(url)
+                # prefetch() runs on every queue poll, a failure must not resolve (and record a failure) every second
+                if future is not None and self._is_failed(future) and time.time() - self._submitted[url] < PREFETCH_RETRY_INTERVAL:
+                    continue
+                if future is None or self._is_stale(future):
+                    logging.info(f"Prefetching direct link for {url}")
+                    self._pending[url] = self._executor.submit(self._resolve, url)
+                    self._submitted[url] = time.time()
+
+    def _resolve(self, url):
+        # The version goes with the link, the DownloadThread drops it when the page changed in the meantime
+        version = _get_version_steamrip(url, self.scraper)
+        return resolve_download(url, self.scraper, self.link_cache, version=version)
+
+    def take(self, url):
+        """Hands the resolution of url over to its DownloadThread, None when there is none or it went stale."""
+        with self._lock:
+            future = self._pending.pop(url, None)
+            self._submitted.pop(url, None)
+        if future is None or self._is_stale(future):
+            return None
+        return future
+
+    def discard(self, url):
+        with self._lock:
+            future = self._pending.pop(url, None)
+            self._submitted.pop(url, None)
+        if future is not None:
+            future.cancel()
+
+    @staticmethod
+    def _is_failed(future):
+        return future.done() and not future.cancelled() and (future.exception() is not None or future.result() is None)
+
+    @classmethod
+    def _is_stale(cls, future):
+        if not future.done() or future.cancelled():
+            return future.cancelled()
+        if cls._is_failed(future):
+            return True
+        return time.time() - future.result().resolved_at > PREFETCH_MAX_AGE
+
+SEGMENT_CHECKPOINT_BYTES = 32 * 1024 * 1024
+MAX_MIRRORS = 2
+# Folder inside Games that archives are unpacked into before they are renamed into place
+INSTALL_STAGING_FOLDER = ".staging"
+MIN_HEALTH_SAMPLE_BYTES = 64 * 1024 * 1024
+CONNECTION_CONTROL_INTERVAL = 5
+PROGRESS_REPORT_INTERVAL = 0.25
+SPEED_WINDOW_SAMPLES = 12
+
+def _format_size(size):
+    if size >= 1024**3:
+        return f"{size / (1024**3):.2f} GB"
+    return f"{size / (1024**2):.2f} MB"
+
+def _format_speed(speed):
+    if speed >= 1024**3:
+        return f"{speed / (1024**3):.2f} GB/s"
+    elif speed >= 1024**2:
+        return f"{speed / (1024**2):.2f} MB/s"
+    elif speed >= 1024:
+        return f"{speed / 1024:.2f} KB/s"
+    return f"{speed:.2f} B/s"
 
 class DownloadThread(QThread):
     progress = pyqtSignal(int)
     state = pyqtSignal(str)
     download_speed = pyqtSignal(str)
+    disk_speed = pyqtSignal(str)
     estimated_time = pyqtSignal(str)
+    segment_speeds = pyqtSignal(list)
     started = pyqtSignal()
     finished = pyqtSignal()
     
@@ -551,21 +829,42 @@ class DownloadThread(QThread):
         self.current_hash = None
         self.downloaded_bytes = 0
         self._resume_pos = 0
-        self.max_speed = 0
+        self.bandwidth_limiter = TokenBucket()
+        self.connection_budget = ConnectionBudget()
+        self.session_pool = SessionPool()
+        self.retry_policy = RetryPolicy()
+        self.buffer_pool = BufferPool()
+        self.download_item = None
+        self.prefetched = None
+        self.page_version = None
+        self.link_cache = LinkCache()
+        self.provider_links = {}
+        self.race_providers = False
+        self.multi_source = False
+        self.disk_space = DiskSpaceLedger()
+        self.space_needed = None
+        self.installer = None
+        self.sources = []
+        self._sources_lock = threading.Lock()
+        self._sources_closed = False
+        self.transfer_started = False
         self._is_paused = False
         self._is_stopped = False
         self.total_size = 0
         self.pause_create = False
-        self.num_parts = 0
         self.current_proxy = {}
-        self.parts = {}
+        self.archive = None
+        self.journal = None
+        self.block_hashes = None
+        self.disk_writer = None
+        self.scheduler = None
+        self.connection_controller = None
+        self.server_info = None
+        self.single_stream = False
         self.total_downloaded = 0
-        self.last_report_time = time.time()
-        self.last_report_bytes = 0
-        self.mega_db_worker_number = 12
+        self.speed_samples = deque(maxlen=SPEED_WINDOW_SAMPLES)
         self.default_worker = 2
         self.success = False
-        self.url_lock = threading.Lock()
         self.active_direct_url = None
         self.current_provider_key = None
 
@@ -580,72 +879,119 @@ class DownloadThread(QThread):
         self._is_stopped = False
         self.total_size = 0
         self.current_proxy = {}
-        self.parts = {}
+        self.archive = None
+        self.journal = None
+        self.block_hashes = None
+        self.disk_writer = None
+        self.scheduler = None
+        self.connection_controller = None
+        self.server_info = None
+        self.single_stream = False
         self.total_downloaded = 0
-        self.last_report_time = time.time()
-        self.last_report_bytes = 0
-        self.mega_db_worker_number = 12
+        self.speed_samples = deque(maxlen=SPEED_WINDOW_SAMPLES)
+        self.prefetched = None
+        self.provider_links = {}
+        self.sources = []
+        self._sources_closed = False
+        self.space_needed = None
+        self.installer = None
+        self.transfer_started = False
         self.success = False
         
-    def set_params(self, url):
+    def set_params(self, url, item=None):
         self.url = url
+        self.download_item = item
         self.current_hash = hash_url(url)
         self.downloaded_bytes = 0
         self.success = False
 
-    def refresh_download_url(self):
-        """Refreshes the direct download URL for the current provider."""
-        with self.url_lock:
-            logging.info(f"Refrehsing URL for provider: {self.current_provider_key}")
-            try:
-                # 1. Re-fetch provider links
-                __links, _ = Downloader.steamrip(self.url, downloader_data, self.my_parrent.scraper)
-                
-                # 2. Get the specific provider's link
-                if self.current_provider_key not in __links or not __links[self.current_provider_key]:
-                    logging.error(f"Refresh failed: Provider {self.current_provider_key} not found in new links.")
-                    return False
+    def refresh_download_url(self, source, generation):
+        """
+        Resolves a fresh direct link for the provider of source, its workers pick it up on their next retry.
+        Single flight: the first worker whose link of the given generation failed refreshes, the others wait
+        for its result. A worker that failed on an older link gets True right away, the link is new already.
+        """
+        while not source.refresh_lock.acquire(timeout=0.5):
+            if self._is_stopped:
+                return False
+        try:
+            if source.generation != generation:
+                return True
+            # A refresh of this link just failed, resolving again right away would fail the same way
+            if source.refresh_failed is not None and source.refresh_failed[0] == generation and time.time() - source.refresh_failed[1] < REFRESH_RETRY_INTERVAL:
+                return False
+            
+            old_host = provider_host(source.url)
+            if self._resolve_fresh_link(source):
+                source.generation += 1
+                self.retry_policy.reset(old_host)
+                return True
+            source.refresh_failed = (generation, time.time())
+            return False
+        finally:
+            source.refresh_lock.release()
 
-                provider_link = __links[self.current_provider_key]
-                
-                # 3. Resolve direct link
-                provider_data = downloader_data["provider"].get(self.current_provider_key)
-                if not provider_data:
-                     logging.error(f"Refresh failed: Provider data not found.")
-                     return False
-                     
-                downloader_func = provider_data["downloader"]
-                
-                logging.info(f"Resolving new direct link using {self.current_provider_key}...")
-                new_download_request = downloader_func(provider_link)
-                
-                if isinstance(new_download_request, int) or new_download_request is None:
-                     logging.error(f"Refresh failed: Downloader returned error {new_download_request}")
-                     return False
-                
-                # 4. Update active url
-                if "url" in new_download_request:
-                     self.active_direct_url = new_download_request["url"]
-                     logging.info(f"URL successfully refreshed: {self.active_direct_url[:50]}...")
-                     return True
-                else:
-                     logging.error("Refresh failed: No URL in response.")
-                     return False
-                     
-            except Exception as e:
-                logging.error(f"Error refreshing URL: {e}", exc_info=True)
+    def _resolve_fresh_link(self, source):
+        provider_key = source.provider_key
+        logging.info(f"Refrehsing URL for provider: {provider_key}")
+        try:
+            # 1. Provider links, the steamrip page is only scraped again when they are unknown
+            self.link_cache.discard(self.current_hash, provider_key)
+            __links = self.provider_links
+            if not __links.get(provider_key):
+                __links, _ = Downloader.steamrip(self.url, downloader_data, self.my_parrent.scraper)
+                self.provider_links = __links
+            
+            # 2. Get the specific provider's link
+            if provider_key not in __links or not __links[provider_key]:
+                logging.error(f"Refresh failed: Provider {provider_key} not found in new links.")
                 return False
 
+            provider_link = __links[provider_key]
+            
+            # 3. Resolve direct link
+            provider_data = downloader_data["provider"].get(provider_key)
+            if not provider_data:
+                 logging.error(f"Refresh failed: Provider data not found.")
+                 return False
+                 
+            downloader_func = provider_data["downloader"]
+            
+            logging.info(f"Resolving new direct link using {provider_key}...")
+            new_download_request = downloader_func(provider_link)
+            
+            if isinstance(new_download_request, int) or new_download_request is None:
+                 logging.error(f"Refresh failed: Downloader returned error {new_download_request}")
+                 return False
+            
+            # 4. Update the source, a new link usually comes with new cookies or tokens
+            if "url" in new_download_request:
+                 source.headers, source.payload, resolver_session = _request_parts(provider_key, new_download_request)
+                 if resolver_session is not None:
+                     source.session.cookies.update(resolver_session.cookies)
+                 source.url = new_download_request["url"]
+                 self.link_cache.store(self.current_hash, provider_key, new_download_request, __links, self.page_version)
+                 logging.info(f"URL successfully refreshed: {source.url[:50]}...")
+                 return True
+            else:
+                 logging.error("Refresh failed: No URL in response.")
+                 return False
+                 
+        except Exception as e:
+            logging.error(f"Error refreshing URL: {e}", exc_info=True)
+            return False
+
     def run(self):
         threading.current_thread().name = "DownloadThread"
         self.state.emit("Checking version...")
         try:
             latest_version = _get_version_steamrip(self.url, self.my_parrent.scraper)
+            self.page_version = latest_version
             
-            # Access current_download safely
+            # Access the queue item of this thread safely
             if hasattr(self.my_parrent, 'download_manager'):
                 manager = self.my_parrent.download_manager
-                current_item = manager.current_download
+                current_item = self.download_item
                 
                 if current_item:
                     old_version = current_item.get("version", "Pending")
@@ -653,11 +999,18 @@ class DownloadThread(QThread):
                         self.state.emit("Version mismatch. Cleaning cache...")
                         hash_val = hash_url(self.url)
                         rar_path = os.path.join(os.getcwd(), "DownloadCache", f"{hash_val}.rar")
-                        if os.path.exists(rar_path):
-                            try:
-                                os.remove(rar_path)
-                            except Exception as e:
-                                logging.error(f"Failed to remove old rar: {e}")
+                        journal_path = os.path.join(os.getcwd(), "DownloadCache", f"{hash_val}.journal.json")
+                        blocks_path = os.path.join(os.getcwd(), "DownloadCache", f"{hash_val}.blocks")
+                        for old_path in (rar_path, journal_path, blocks_path):
+                            if os.path.exists(old_path):
+                                try:
+                                    os.remove(old_path)
+                                except Exception as e:
+                                    logging.error(f"Failed to remove old cache file {old_path}: {e}")
+                        # Links resolved for the old version would download the old archive again
+                        for provider_key in downloader_data["provider"]:
+                            self.link_cache.discard(hash_val, provider_key)
+                        self.prefetched = None
                     
                     current_item["version"] = latest_version
                     manager._save_queue()
@@ -668,9 +1021,6 @@ class DownloadThread(QThread):
         if not os.path.exists(os.path.join(os.getcwd(), "DownloadCache")):
             os.mkdir(os.path.join(os.getcwd(), "DownloadCache"))
         
-        error = {
-            -1: "1Ficher on cooldown"
-        }
         if not self.url:
             logging.error("Error: No URL set!")
             self.state.emit("Error: No URL set!")
@@ -682,286 +1032,188 @@ class DownloadThread(QThread):
         
         skip = False # Initialize skip flag
 
-        __links, name = Downloader.steamrip(self.url, downloader_data, self.my_parrent.scraper)
-        self.state.emit(f"Finding Best link...")
-        __best_downloader, __best_downloader_key = _get_best_downloader(__links)
-        
-        if __best_downloader is None:
-            logging.error("Download failed: Could not find a downloader.")
+        selected = self._select_source()
+        if selected is None:
+            self.state.emit("Download failed. No provider delivered a working link.")
             return
         
-        logging.info(f"Downloader: Best downloader: {__best_downloader_key}")
-    
-        __downloader_function = __best_downloader["downloader"]
-        
-        __download_request = __downloader_function(__links[__best_downloader_key])
-        if isinstance(__download_request, int):
-            logging.error(error[__download_request])
-            logging.info("We are getting the next best Downlaoder")
-            
-            __best_downloader, __best_downloader_key = _get_best_downloader(__links, ignore=__best_downloader_key)
-            if __best_downloader is None:
-                logging.error("Download failed: Could not find a better Downloader...")
-                return
-            
-            logging.info(f"Downloader: Best downloader: {__best_downloader_key}")
-    
-            __downloader_function = __best_downloader["downloader"]
-            
-            __download_request = __downloader_function(__links[__best_downloader_key])
+        resolved, headers, payload, session = selected
+        __best_downloader_key = resolved.provider_key
+        __download_request = resolved.request
+        self.provider_links = resolved.links
         
         logging.info(f"Downloader: Starting the download with: {__download_request}")
         self.state.emit(f"Downloading...")
         
         self.current_provider_key = __best_downloader_key
-        if isinstance(__download_request, dict) and "url" in __download_request:
-            self.active_direct_url = __download_request["url"]
-
-        if __best_downloader_key== "ficher":
-            logging.debug("Ficher detected setting default worker to 1")
-            self.default_worker = 1
-            self.num_parts = 1
-        
-        elif __best_downloader_key == "gofile":
-            logging.debug("Gofile detected setting default worker to 2")
-            self.default_worker = 2
-            self.num_parts = 2
-        
-        elif __best_downloader_key == "datanode":
-            pass
-        
-        elif __best_downloader_key == "filecrypt":
-            pass
-        
-        elif __best_downloader_key == "buzzheavier":
-            logging.debug("Buzzheavier detected setting default worker to 2")
-            self.default_worker = 5
-            self.num_parts = 5
-        
-        if __best_downloader_key == "megadb":
-                if isinstance(__download_request, int):
-                    logging.error(f"Downloader:megadb Failed with code: {__download_request}")
-                    self.state.emit("Download failed.")
-                    return
-
-                self.num_parts = self.mega_db_worker_number
-                __download_url_megadb = __download_request["url"]
-
-                response = requests.head(__download_url_megadb)
-                file_size = int(response.headers.get('Content-Length', 0))
-                self.total_size = file_size
-                skip = False
-                if os.path.exists(os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")):
-                    existing_size = os.path.getsize(os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar"))
-                    if existing_size == file_size:
-                        logging.info("File already downloaded, skipping download.")
-                        self.state.emit(f"File already downloaded, skipping download.")
-                        skip = True
-                
-                part_size = file_size // self.mega_db_worker_number
-                ranges = [(i * part_size, (i + 1) * part_size - 1) for i in range(self.mega_db_worker_number)]
-                ranges[-1] = (ranges[-1][0], file_size - 1)
-
-                if not skip:
-                    try:
-                        with ThreadPoolExecutor(max_workers=self.mega_db_worker_number, thread_name_prefix=f"DL_Worker_megadb") as executor:
-                            futures = []
-                            proxy = None
-                            for i, (start, end) in enumerate(ranges):
-                                
-                                futures.append(executor.submit(self.download_part, i, start, end, file_size, self.active_direct_url))
-                                time.sleep(2)
-                                
-                                while self.pause_create:
-                                    QThread.msleep(100)
-
-                            for future in futures:
-                                try:
-                                    future.result()
-                                except Exception as e:
-                                    logging.error(f"MegaDB download part failed: {e}")
-                                    self.state.emit("Download failed.")
-                                    return 
-                    except Exception as e:
-                        logging.error(f"MegaDB ThreadPool error: {e}")
-                        self.state.emit("Download failed.")
-                        return
-
-                    if not self._is_stopped:
-                        self.combine_parts()
+        self.active_direct_url = __download_request["url"]
+        self.server_info = resolved.server_info
+
+        file_size = self.server_info.total_size
+        validators = (self.server_info.etag, self.server_info.last_modified)
+
+        self.single_stream = not self.server_info.supports_ranges
+        if self.single_stream:
+            logging.warning(f"{provider_host(self.active_direct_url)} does not honour range requests, downloading with a single stream.")
+
+        # Seed values only, the controller moves to the best count it learned for this host
+        __provider = downloader_data["provider"][__best_downloader_key]
+        self.connection_controller = ConnectionController(
+            provider_host(self.active_direct_url),
+            __provider.get("connections", self.default_worker),
+            maximum=1 if self.single_stream else __provider.get("max_connections", self.default_worker)
+        )
+        self.default_worker = self.connection_controller.target
+        self.sources = [DownloadSource(__best_downloader_key, self.active_direct_url, headers, payload, session, self.connection_controller)]
+
+        self.total_size = file_size
+        skip = False
+        
+        # Admission: the archive and its unpacked folder must fit before any byte is transferred
+        needs = self._space_needed(file_size)
+        shortfall = self.disk_space.reserve(self.current_hash, needs)
+        if shortfall:
+            logging.warning(f"Not enough disk space for {self.current_hash}, missing {[(path, _format_size(size)) for path, size in shortfall.items()]}")
+            self.space_needed = needs
+            self.state.emit(f"Waiting for disk space, {_format_size(sum(shortfall.values()))} more needed.")
+            return
         
-        else:
-            url = __download_request["url"]
-            headers = __download_request["headers"]
-            payload = __download_request["payload"]
-            
-            session = __download_request.get("session", None)
-            
-            if session==None:
-                response = requests.get(url, headers=headers, data=payload, stream=True)
+        try:
+            self._prepare_archive(file_size, *validators)
+        except OSError as e:
+            if e.errno != errno.ENOSPC:
+                raise
+            self._hold_for_space(needs)
+            return
+        # The archive is allocated on disk now, only the unpacked folder is still ahead
+        self.disk_space.update(self.current_hash, self._space_needed(file_size))
+        if self.journal.is_complete():
+            problem = validate_archive(self.archive.path, file_size)
+            if problem:
+                # Downloaded anew right away instead of finding out after a failed unpack
+                logging.warning(f"Cached archive {problem}, downloading it again.")
+                self.state.emit("Cache corrupt. Downloading again...")
+                self.journal.reset(file_size, self.current_provider_key, *validators)
+                self.block_hashes.reset(file_size)
+                self.total_downloaded = 0
             else:
-                response = session.get(url, headers=headers, data=payload, stream=True)
-            file_size = int(response.headers.get('Content-Length', 0))
-            response.close()
-            self.total_size = file_size
-            skip = False
+                logging.info("File already downloaded, skipping download.")
+                self.state.emit(f"File already downloaded, skipping download.")
+                self.journal.remove()
+                self.transfer_started = True
+                skip = True
             
-            if os.path.exists(os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")):
-                    existing_size = os.path.getsize(os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar"))
-                    if existing_size == file_size:
-                        logging.info("File already downloaded, skipping download.")
-                        self.state.emit(f"File already downloaded, skipping download.")
-                        skip = True
-                
-            if self.default_worker > 0:
-                part_size = file_size // self.default_worker
-                ranges = [(i * part_size, (i + 1) * part_size - 1) for i in range(self.default_worker)]
-                ranges[-1] = (ranges[-1][0], file_size - 1)
-
-                if not skip:
-                    try:
-                        with ThreadPoolExecutor(max_workers=self.default_worker, thread_name_prefix=f"DL_Worker_{self.current_provider_key}") as executor:
-                            futures = []
-                            for i, (start, end) in enumerate(ranges):
-                                time.sleep(0.5)
-                                futures.append(executor.submit(self.download_part, i, start, end, file_size, self.active_direct_url, headers, payload, self.default_worker, session=session))
-
-                            for future in futures:
-                                try:
-                                    future.result()
-                                except Exception as e:
-                                    logging.error(f"Download part failed: {e}")
-                                    self.state.emit("Download failed.")
-                                    return
-                    except Exception as e:
-                         logging.error(f"ThreadPool error: {e}")
-                         self.state.emit("Download failed.")
-                         return
+        if self.default_worker > 0 and not skip:
+            if not self._download_segments(file_size):
+                return
 
-                    if not self._is_stopped:
-                        self.combine_parts()
+            if not self._is_stopped and not self._finish_archive():
+                return
         
         if self._is_stopped:
             self.state.emit("Stopped.")
             return
-            
-        self.state.emit(f"Unpacking...")
-        rar_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")
         
-        folder_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}")
-        
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
-        
-        os.mkdir(folder_path)
-        self.progress.emit(0)
-        process = subprocess.Popen([os.path.join(APPDATA_CACHE_PATH, "Tools", "UnRAR.exe"), "x", "-y",rar_path, folder_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
-        
-        start_time = time.time()
-        
-        try:
-            while process.poll() is None:
-                for line in process.stdout:
-                    logging.debug(line.strip())
-                    match = re.search(r'(\d+)%', line)
-                    if match:
-                        percent = int(match.group(1))
-                        self.progress.emit(percent)
-                        
-                        if percent > 0:
-                            elapsed_time = time.time() - start_time
-                            estimated_total_time = elapsed_time / (percent / 100)
-                            remaining_time = estimated_total_time - elapsed_time
-                            
-                            hours, rem = divmod(remaining_time, 3600)
-                            minutes, seconds = divmod(rem, 60)
-                            formatted_time = f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
-                            self.estimated_time.emit(formatted_time)
-
-        except AttributeError:
-            self.progress.emit(100)
-        
-        process.wait()
-        logging.debug(f"Unpacking finished with code: {process.returncode}")
-
-        if process.returncode != 0:
-            if skip:
-                self.state.emit("Cache corrupt. Retrying...")
-                logging.warning("Unpacking failed on cached file. Deleting and retrying.")
-                try:
-                    os.remove(rar_path)
-                except OSError:
-                    pass
-                self.run()
-                return
-            else:
-                self.state.emit("Unpacking failed.")
-                logging.error("Unpacking failed.")
+        if not skip:
+            problem = validate_archive(self.archive.path, file_size)
+            if problem:
+                self.state.emit(f"Error: Downloaded archive {problem}.")
+                logging.error(f"Downloaded archive {problem}.")
                 return
+            
+        # The archive is complete, unpacking and registering run in the install stage so the next item can download
+        self.installer = InstallThread(self.my_parrent, url_backup, self.current_hash, cached=skip)
+        self.state.emit("Downloaded, waiting to unpack...")
+        self.finished.emit()
+    
+    def _select_source(self):
+        """
+        Resolves a direct link and probes its host, walking down the provider ranking while a provider
+        fails to resolve or its link does not answer. Returns (resolved, headers, payload, session) or None.
+        """
+        tried = set()
+        resolved = None
+        if self.prefetched is not None:
+            # The manager started resolving this item while earlier ones were still downloading
+            self.state.emit(f"Waiting for prefetched link...")
+            try:
+                resolved = self.prefetched.result()
+            except Exception as e:
+                logging.warning(f"Prefetched link resolution failed, resolving again: {e}")
+            self.prefetched = None
+            if resolved is not None and self.page_version is not None and resolved.version != self.page_version:
+                logging.info(f"Prefetched link was resolved for version {resolved.version}, the page is at {self.page_version}. Resolving again.")
+                resolved = None
+        
+        while True:
+            if resolved is None and self._should_race():
+                self.state.emit(f"Racing providers...")
+                resolved = race_download(self.url, self.my_parrent.scraper, self.link_cache, exclude=tried, version=self.page_version)
+                if resolved is None:
+                    return None
+            elif resolved is None:
+                self.state.emit(f"Finding Best link...")
+                resolved = resolve_download(self.url, self.my_parrent.scraper, self.link_cache, exclude=tried, version=self.page_version)
+                if resolved is None:
+                    return None
+            
+            __download_request = resolved.request
+            headers, payload, session = _request_parts(resolved.provider_key, __download_request)
+            
+            try:
+                server_info = resolved.server_info or probe_server(__download_request["url"], headers, payload, session, self.current_proxy)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Probing the download host failed: {e}")
+                server_info = None
+            
+            if server_info is not None and server_info.total_size > 0:
+                resolved.server_info = server_info
+                return resolved, headers, payload, session
+            
+            logging.error(f"Downloader:{resolved.provider_key} link does not deliver a file, trying the next provider.")
+            ProviderHealth().record_transfer(resolved.provider_key, success=False)
+            self.link_cache.discard(self.current_hash, resolved.provider_key)
+            tried.add(resolved.provider_key)
+            resolved = None
 
-        rename_path = None
-        for file in os.listdir(folder_path):
-            if file == "_CommonRedist":
-                continue
-            if os.path.isdir(os.path.join(folder_path, file)):
-                rename_path = os.path.join(folder_path, file)
-        
-        if not rename_path:
-            self.state.emit("Error: Game folder not found.")
-            logging.error("Unpacking successful but no game folder found.")
-            return
-
-        if os.path.exists(os.path.join(os.getcwd(), "Games", self.current_hash)):
-            shutil.rmtree(os.path.join(os.getcwd(), "Games", self.current_hash))
-        
-        time.sleep(1)
-
-        try:
-            os.rename(rename_path, os.path.join(folder_path, self.current_hash))
-            shutil.move(os.path.join(folder_path, self.current_hash), os.path.join(os.getcwd(), "Games"))
-        except Exception as e:
-             self.state.emit(f"Error moving files: {e}")
-             logging.error(f"Error moving files: {e}")
-             return
-        
-        exe_path = _game_naming(self.current_hash)
-        logging.debug(exe_path)
-        if not self.current_hash in exe_path:
-            new_path = ""
-            splitted = exe_path.split("\\")
-            repalce_this = splitted[1]
-            for part in splitted:
-                if part == repalce_this:
-                    part == self.current_hash
-                
-                new_path+=part
-                if not part.endswith(".exe"):
-                    new_path+="\\"
-        data = load_json(os.path.join(CONFIG_FOLDER, "games.json"))
-        if not self.current_hash in data.keys():
-            data[self.current_hash] = {"args": [], "exe": exe_path, "name": self.current_hash, "alias": get_name_from_url(url_backup), "link": url_backup, "version": _get_version_steamrip(url_backup, self.my_parrent.scraper), "categorys": [], "playtime": 0}
-        else:
-            data[self.current_hash]["exe"] = exe_path
-            data[self.current_hash]["version"] = _get_version_steamrip(url_backup, self.my_parrent.scraper)
+    def _hold_for_space(self, needs):
+        """
+        The file system refused the archive although the ledger let it through, reserved blocks or a quota make
+        it report more free space than it grants. The item waits until that much more is free than now.
+        """
+        cache_path = os.path.dirname(self.archive.path)
+        logging.warning(f"No space left to allocate {self.archive.path}, the item waits for disk space.")
+        self.space_needed = dict(needs)
+        self.space_needed[cache_path] = shutil.disk_usage(cache_path).free - self.disk_space.margin + needs[cache_path]
+        self.state.emit(f"Waiting for disk space, {_format_size(needs[cache_path])} more needed.")
 
-        save_json(os.path.join(CONFIG_FOLDER, "games.json"), data)
-        
-        try:
-            shutil.rmtree(os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}"))
-            os.remove(rar_path)
-        except Exception as e:
-            logging.warning(f"Cleanup failed: {e}")
+    def _space_needed(self, file_size):
+        """
+        Bytes still to be claimed per path: the unallocated part of the archive in DownloadCache and the
+        unpacked game, which is staged on the file system of Games and renamed into place.
+        """
+        cache_path = os.path.join(os.getcwd(), "DownloadCache")
+        games_path = os.path.join(os.getcwd(), "Games")
+        archive_path = os.path.join(cache_path, f"{self.current_hash}.rar")
+        
+        allocated = 0
+        if os.path.exists(archive_path):
+            stat = os.stat(archive_path)
+            # A failed fallocate leaves a sparse file at full size, only the blocks on disk are allocated
+            allocated = min(stat.st_size, stat.st_blocks * 512) if hasattr(stat, "st_blocks") else stat.st_size
+        return {cache_path: max(0, file_size - allocated), games_path: int(file_size * EXTRACT_FACTOR)}
+
+    def _should_race(self):
+        """Racing costs a few seconds and extra resolver runs, it only pays off for large uncapped downloads."""
+        return self.race_providers and self.bandwidth_limiter.rate <= 0 and _expected_size(self.url) >= RACE_MIN_SIZE
+
+    def _record_transfer(self, source, success):
+        """Feeds the provider ranking, throughput only counts for uncapped transfers that moved enough bytes."""
+        throughput = None
+        if source.active_seconds > 0 and source.downloaded >= MIN_HEALTH_SAMPLE_BYTES and self.bandwidth_limiter.rate <= 0:
+            throughput = source.downloaded / source.active_seconds
+        ProviderHealth().record_transfer(source.provider_key, success, throughput)
 
-        self.state.emit(f"Finished")
-        self.success = True
-        self.finished.emit()
-    
     def download_file(self, url, headers, payload, total_size):
         filename = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")
 
@@ -980,13 +1232,8 @@ class DownloadThread(QThread):
             self.state.emit("Download failed~")
             return
 
-        max_bytes_per_sec = int(self.max_speed) * 1024 if int(self.max_speed) > 0 else None
-        chunk_size = 1024
-        start_time = time.time()
-        bytes_this_second = 0
-
-        with open(filename, 'ab') as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
+        with self.buffer_pool.borrow() as view, open(filename, 'ab') as f:
+            while True:
                 if self._is_stopped:
                     logging.error("Download stopped unexpectedly.")
                     self.state.emit("Download stopped~")
@@ -994,302 +1241,760 @@ class DownloadThread(QThread):
                 if self._is_paused:
                     QThread.msleep(100)
                     continue
-                if not chunk:
-                    continue
 
-                f.write(chunk)
-                downloaded_size += len(chunk)
-                bytes_this_second += len(chunk)
+                received = response.raw.readinto(view[:self.bandwidth_limiter.read_size(len(view))])
+                if not received:
+                    break
+
+                f.write(view[:received])
+                downloaded_size += received
 
-                self.total_downloaded += len(chunk)
+                self.total_downloaded += received
                 if downloaded_size!=0:
                     progress_percentage = (downloaded_size / total_size) * 100
                     self.progress.emit(int(progress_percentage))
                 self.calculate_speed()
-
-                if max_bytes_per_sec:
-                    elapsed = time.time() - start_time
-                    if elapsed < 1.0 and bytes_this_second >= max_bytes_per_sec:
-                        time.sleep(1.0 - elapsed)
-                        start_time = time.time()
-                        bytes_this_second = 0
-                    elif elapsed >= 1.0:
-                        start_time = time.time()
-                        bytes_this_second = 0
+                self.bandwidth_limiter.consume(received)
 
         if downloaded_size >= total_size:
             logging.info("Download completed successfully.")
             self.state.emit("Download completed~")
 
-    def download_part(self, part_num, start, end, total_size, url, headers=None, payload=None, max_worker = 0, proxy=None, session=None):
+    def _download_segments(self, file_size):
+        """
+        Runs the segment workers of every source until the archive is complete, the scheduler rebalances
+        ranges between them. Each pool is sized to its provider maximum, workers beyond the controller target
+        stay parked. With multi_source enabled, mirrors of the archive join while the primary is downloading.
+        """
+        # A single stream never splits, no range is ever smaller than twice the file size
+        self.scheduler = SegmentScheduler(self.journal.missing_ranges(), file_size, min_split=file_size if self.single_stream else MIN_SPLIT_BYTES)
+        self.disk_writer = DiskWriter(self.archive.path, self.buffer_pool)
+        self._sources_closed = False
+        self.transfer_started = True
+        
+        reporter_stop = threading.Event()
+        reporter = threading.Thread(target=self._report_progress, args=(reporter_stop,), name="DL_Reporter", daemon=True)
+        reporter.start()
+        
+        mirrors_stop = threading.Event()
+        if self.multi_source and not self.single_stream:
+            threading.Thread(target=self._attach_mirrors, args=(file_size, mirrors_stop), name="DL_Mirrors", daemon=True).start()
+        
+        try:
+            self._start_source(self.sources[0], file_size)
+
+            # The staggered start counts as transfer time, the first bytes arrive during it
+            last_time = self.sources[0].started_at
+            while True:
+                with self._sources_lock:
+                    sources = list(self.sources)
+                futures = [future for source in sources for future in source.futures]
+                done, pending = wait(futures, timeout=CONNECTION_CONTROL_INTERVAL, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    if future.exception() is not None:
+                        logging.error(f"Download worker failed: {future.exception()}")
+                        self._is_stopped = True
+                        self.state.emit("Download failed.")
+                        for source in sources:
+                            self._record_transfer(source, False)
+                        return False
+                
+                now = time.time()
+                self.total_downloaded = self.scheduler.downloaded_bytes()
+                for source in sources:
+                    # A mirror that joined during the interval only counts from its own start
+                    elapsed = now - max(last_time, source.started_at)
+                    if not self._is_paused and elapsed > 0:
+                        source.active_seconds += elapsed
+                        if pending and not source.failed:
+                            source.controller.update((source.downloaded - source.last_downloaded) / elapsed)
+                    source.last_downloaded = source.downloaded
+                last_time = now
+                
+                if not pending:
+                    with self._sources_lock:
+                        # A mirror that started its workers meanwhile keeps the loop running
+                        if all(future.done() for source in self.sources for future in source.futures):
+                            self._sources_closed = True
+                            break
+        except Exception as e:
+            logging.error(f"ThreadPool error: {e}")
+            self.state.emit("Download failed.")
+            return False
+        finally:
+            mirrors_stop.set()
+            with self._sources_lock:
+                self._sources_closed = True
+                sources = list(self.sources)
+            for source in sources:
+                if source.executor is not None:
+                    source.executor.shutdown(wait=True)
+                self.connection_budget.unregister(source.controller)
+                source.controller.save()
+                if source.pooled_url is not None:
+                    self.session_pool.release(source.pooled_url, source.controller.maximum)
+                logging.info(f"Retry metrics of {source.controller.host}: {self.retry_policy.metrics(source.controller.host)}")
+            # Workers are gone, the writer drains its queue and runs the last journal updates
+            self.disk_writer.close()
+            logging.info(f"Disk writer of {self.current_hash}: {self.disk_writer.written} bytes at {_format_speed(self.disk_writer.throughput())} while busy")
+            reporter_stop.set()
+            reporter.join()
+        
+        # A stopped transfer says nothing about the provider's reliability, only about its speed
+        for source in sources:
+            self._record_transfer(source, None if self._is_stopped else not source.failed)
+        return True
+
+    def _start_source(self, source, file_size):
+        """Registers the source with the connection budget and starts its workers, staggered up to its target."""
+        controller = source.controller
+        with self._sources_lock:
+            if self._sources_closed:
+                return
+            self.connection_budget.register(controller)
+            # Workers of a host share one keep-alive session, the cookies of the resolver come along
+            resolver_session = source.session
+            source.pooled_url = source.url
+            source.session = self.session_pool.acquire(source.url, controller.maximum, resolver_session.cookies if resolver_session is not None else None)
+            source.executor = ThreadPoolExecutor(max_workers=controller.maximum, thread_name_prefix=f"DL_Worker_{source.provider_key}")
+            source.started_at = time.time()
+
+        for worker_id in range(controller.maximum):
+            with self._sources_lock:
+                if self._sources_closed:
+                    return
+                source.futures.append(source.executor.submit(self._segment_worker, source, worker_id, file_size))
+            if worker_id < controller.target:
+                time.sleep(0.5)
+            
+            while self.pause_create:
+                QThread.msleep(100)
+
+    def _attach_mirrors(self, file_size, stop_event):
+        """
+        Adds the other providers of this page as further sources, best ranked first. A mirror only joins
+        when it serves the same archive: same size, and the same ETag or the same hash for a block the
+        primary source already delivered, since different hosts rarely share ETags.
+        """
+        primary = self.sources[0]
+        mirrors = _rank_downloaders(self.provider_links, file_size, exclude={primary.provider_key})[:MAX_MIRRORS]
+        for key in mirrors:
+            if stop_event.is_set():
+                return
+            
+            entry = self.link_cache.get(self.current_hash, key, downloader_data["provider"][key].get("link_ttl", LINK_CACHE_TTL), self.page_version)
+            if entry is not None:
+                request = LinkCache.request_from(entry)
+            else:
+                resolved = _resolve_provider(self.url, key, self.provider_links, self.link_cache, self.page_version)
+                if resolved is None:
+                    continue
+                request = resolved.request
+            
+            headers, payload, session = _request_parts(key, request)
+            try:
+                same_archive = self._is_same_archive(request["url"], headers, payload, session, stop_event)
+            except requests.exceptions.RequestException as e:
+                logging.warning(f"Mirror {key} is unreachable: {e}")
+                self.link_cache.discard(self.current_hash, key)
+                continue
+            if not same_archive:
+                logging.warning(f"Mirror {key} does not serve the same archive, ignoring it.")
+                continue
+            
+            __provider = downloader_data["provider"][key]
+            controller = ConnectionController(
+                provider_host(request["url"]),
+                __provider.get("connections", self.default_worker),
+                maximum=__provider.get("max_connections", self.default_worker)
+            )
+            source = DownloadSource(key, request["url"], headers, payload, session, controller)
+            with self._sources_lock:
+                if self._sources_closed:
+                    return
+                self.sources.append(source)
+            
+            logging.info(f"Mirror {key} joins the download of {self.current_hash}")
+            self._start_source(source, file_size)
+
+    def _is_same_archive(self, url, headers, payload, session, stop_event):
+        server_info = probe_server(url, headers, payload, session, self.current_proxy)
+        if server_info.total_size != self.total_size or not server_info.supports_ranges:
+            return False
+        if self.server_info.etag and server_info.etag == self.server_info.etag:
+            return True
+        
+        # Wait until the primary source completed a block, a fresh download has none yet
+        while not stop_event.is_set():
+            known = self.block_hashes.known(range(self.block_hashes.block_count()))
+            if known:
+                index = known[len(known) // 2]
+                start, end = self.block_hashes.block_range(index)
+                return hash_remote_range(url, start, end, headers, payload, session, self.current_proxy) == self.block_hashes.hashes[index]
+            stop_event.wait(2)
+        return False
+
+    def _has_healthy_source(self):
+        with self._sources_lock:
+            return any(not source.failed for source in self.sources)
+
+    def _report_progress(self, stop_event):
+        """Samples the worker counters at a fixed rate, so the GUI gets a few signals per second instead of one per read."""
+        while not stop_event.wait(PROGRESS_REPORT_INTERVAL):
+            self._emit_progress()
+        self._emit_progress()
+
+    def _emit_progress(self):
+        self.total_downloaded = self.scheduler.downloaded_bytes()
+        if self.total_size > 0:
+            self.progress.emit(int(self.total_downloaded / self.total_size * 100))
+        self.calculate_speed()
+
+    def _segment_worker(self, source, worker_id, total_size):
+        source.worker_started(worker_id)
+        failed = False
+        try:
+            while not self._is_stopped and not source.failed:
+                if source.over_target(worker_id):
+                    if not self.scheduler.has_work():
+                        return
+                    QThread.msleep(500)
+                    continue
+                
+                segment = self.scheduler.next_segment()
+                if segment is None:
+                    return
+                
+                success = False
+                try:
+                    success = self.download_part(segment, total_size, source, worker_id=worker_id)
+                finally:
+                    failed = not success and not self._is_stopped
+                    if failed:
+                        # One bad range does not drop the source, only its last worker giving up does
+                        source.worker_ended(worker_id, failed=True)
+                    # The range of a failed worker goes back to the others, it only fails when no source is left
+                    self.scheduler.release(segment, failed=failed and not self._has_healthy_source())
+                
+                if not success:
+                    return
+        finally:
+            if not failed:
+                source.worker_ended(worker_id)
+
+    def download_part(self, segment, total_size, source, worker_id=0):
+        part_num = segment.index
         retries = 0
         max_retries = 10
         
         while retries < max_retries:
             if retries > 0:
-                 logging.info(f"Retry {retries} for part {part_num}")
-                 if self.active_direct_url:
-                     url = self.active_direct_url
-
-            filename = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}_part_{part_num}")
+                 logging.info(f"Retry {retries} for part {part_num} from {source.provider_key}")
+            # A refresh replaces the link of the source, every attempt reads it anew
+            # Generation first, a link refreshed in between then only looks older than it is
+            generation = source.generation
+            url, headers, payload, session = source.url, source.headers, source.payload, source.session
+            host = provider_host(url)
+            if not self.retry_policy.admit(host, lambda: self._is_stopped):
+                return False
 
-            if max_worker!=0:
-                self.mega_db_worker_number = max_worker
+            current_request_start = segment.position
+            if current_request_start > segment.end:
+                logging.info(f"Part {part_num} already downloaded, skipping.")
+                self.pause_create = False
+                return True
             
-            if os.path.exists(filename):
-                existing_size = os.path.getsize(filename)
-                if existing_size >= (end - start + 1):
-                    logging.info(f"Part {part_num} already downloaded, skipping.")
-                    self.pause_create = False
-                    
-                    # Only add to total if this is the first attempt (approximate fix for stats)
-                    if retries == 0:
-                        self.total_downloaded += existing_size
-                    
-                    try:
-                        progress_percentage = (self.total_downloaded / total_size) * 100
-                    except ZeroDivisionError:
-                        progress_percentage = 0
-                    self.progress.emit(int(progress_percentage))
-                    self.parts[part_num] = filename
-                    return
-                
-                # Update header for resumption
-                current_request_start = start + existing_size
-                if retries == 0:
-                     self.total_downloaded += existing_size 
-                
+            if current_request_start > segment.start:
                 logging.info(f"Resuming part {part_num} from byte {current_request_start}.")
-            else:
-                current_request_start = start
-                
-            if headers == None:
-                headers = {}
             
-            headers['Range'] = f"bytes={current_request_start}-{end}"
+            # Workers share the caller's headers, so every request gets its own copy with its own range
+            request_headers = dict(headers) if headers else {}
+            if not self.single_stream:
+                request_headers['Range'] = f"bytes={current_request_start}-{segment.end}"
             
             try:
-                if session==None:
-                    response = requests.get(url, headers=headers, data=payload, stream=True, proxies=self.current_proxy, timeout=30)
-                else:
-                    response = session.get(url, headers=headers, data=payload, stream=True, proxies=self.current_proxy, timeout=30)
+                response = session.get(url, headers=request_headers, data=payload, stream=True, proxies=self.current_proxy, timeout=30)
 
-                if response.status_code == 503:
-                    logging.error(f"503 Service Unavailable for part {part_num}. Retrying...")
-                    time.sleep(2)
+                if response.status_code in (429, 503):
+                    logging.error(f"{response.status_code} Throttled for part {part_num}. Retrying...")
+                    source.controller.report_throttle()
+                    response.close()
+                    self._back_off(host, retries, throttled=True, wait_hint=retry_after(response))
                     retries += 1
                     continue
                 
                 if response.status_code not in (200, 206):
                     logging.error(f"Failed to request partial content for part {part_num}. Status code: {response.status_code}")
                     logging.error(f"Response: {response.text}")
+                    self._back_off(host, retries)
+                    retries += 1
+                    continue
+
+                # A 200 carries the whole file from byte 0, written at this offset it would corrupt the archive
+                if response.status_code == 200 and not self.single_stream:
+                    logging.error(f"Server ignored the range request of part {part_num}, rejecting the full body.")
+                    response.close()
+                    self._back_off(host, retries)
                     retries += 1
-                    time.sleep(2)
                     continue
                 
+                self.retry_policy.record_success(host)
                 self.pause_create = False
 
-                max_bytes_per_sec = int(self.max_speed) * 1024 / self.mega_db_worker_number if int(self.max_speed) > 0 else None
-                chunk_size = 1024
-                start_time = time.time()
-                bytes_this_second = 0
-
-                with open(filename, 'ab') as f:
-                    for chunk in response.iter_content(chunk_size=chunk_size):
+                # Without range support the stream always starts at byte 0, bytes already on disk are read past
+                skip_bytes = current_request_start if response.status_code == 200 else 0
+                position = current_request_start
+                last_checkpoint = position
+                # The head of a block that starts before position may still wait in the writer queue
+                if position % self.block_hashes.block_size:
+                    self.disk_writer.flush()
+                block_stream = self.block_hashes.stream(self.archive.path, position)
+
+                # Read straight from the socket stream into a pooled buffer, filled buffers go to the disk writer
+                buffer = self.buffer_pool.acquire()
+                try:
+                    while True:
                         if self._is_stopped:
-                            return
+                            response.close()
+                            return False
                         while self._is_paused:
                             QThread.msleep(100)
-                        if not chunk:
+                        # Hand the rest of the range back when the controller reduced the connection count
+                        if source.over_target(worker_id):
+                            break
+                        view = memoryview(buffer)
+                        received = response.raw.readinto(view[:self.bandwidth_limiter.read_size(len(view))])
+                        if not received:
+                            break
+                        offset = min(skip_bytes, received)
+                        skip_bytes -= offset
+                        if offset == received:
+                            self.bandwidth_limiter.consume(received)
                             continue
-                        max_bytes_per_sec = int(self.max_speed) * 1024 / self.mega_db_worker_number if int(self.max_speed) > 0 else None
-                        f.write(chunk)
-                        self.total_downloaded += len(chunk)
-                        try:
-                            progress_percentage = (self.total_downloaded / total_size) * 100
-                        except ZeroDivisionError:
-                            progress_percentage = 0
-                        self.progress.emit(int(progress_percentage))
-                        self.calculate_speed()
-
-                        if max_bytes_per_sec:
-                            bytes_this_second += len(chunk)
-                            elapsed = time.time() - start_time
-                            if elapsed < 1.0 and bytes_this_second >= max_bytes_per_sec:
-                                time.sleep(1.0 - elapsed)
-                                start_time = time.time()
-                                bytes_this_second = 0
-                            elif elapsed >= 1.0:
-                                start_time = time.time()
-                                bytes_this_second = 0
-                
-                self.parts[part_num] = filename
-                return
+                        # The scheduler may have handed the back of this range to another worker
+                        length = self.scheduler.claim(segment, received - offset)
+                        if length == 0:
+                            break
+                        block_stream.update(view[offset:offset + length])
+                        # Blocks only while the writer queue is full, the buffer belongs to the writer from here
+                        self.disk_writer.write(position, buffer, offset, length)
+                        buffer = self.buffer_pool.acquire()
+                        source.add_bytes(length)
+                        position += length
+
+                        if position - last_checkpoint >= SEGMENT_CHECKPOINT_BYTES:
+                            self._checkpoint(last_checkpoint, position)
+                            last_checkpoint = position
 
-            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError, ConnectionResetError, requests.exceptions.ReadTimeout) as e:
+                        self.bandwidth_limiter.consume(offset + length)
+
+                        if position > segment.end:
+                            break
+                finally:
+                    # Every exit records what was queued, a broken connection too, the retry resumes behind these bytes
+                    self._checkpoint(last_checkpoint, position)
+                    self.buffer_pool.release(buffer)
+                response.close()
+
+                if position > segment.end or source.over_target(worker_id):
+                    return True
+
+                logging.warning(f"Part {part_num} ended early at byte {position}. Retrying...")
+                self._back_off(host, retries)
+                retries += 1
+                continue
+
+            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError, ConnectionResetError, requests.exceptions.ReadTimeout, ProtocolError, ReadTimeoutError) as e:
                 logging.error(f"Network error in part {part_num}: {e}")
+                self._back_off(host, retries)
                 retries += 1
-                time.sleep(2)
                 
-                if retries >= 3:
+                # Network errors that opened the breaker of the host usually mean the link itself died
+                if retries >= 3 or self.retry_policy.is_open(host):
                      logging.warning(f"Attempts {retries} failed. Refreshing link...")
-                     if self.refresh_download_url():
-                         url = self.active_direct_url
-                     else:
+                     if not self.refresh_download_url(source, generation):
                          logging.error("Failed to refresh link.")
                 continue
                 
             except Exception as e:
                 logging.error(f"Unexpected error in part {part_num}: {e}", exc_info=True)
-                return
+                return False
 
         logging.error(f"Part {part_num} failed completely after retries.")
+        return False
 
-    def combine_parts(self):
-        if len(self.parts) < self.num_parts:
-            self.state.emit("Error: Download failed. Not all parts were downloaded.")
+    def _back_off(self, host, attempt, throttled=False, wait_hint=None):
+        """Sleeps the delay the retry policy hands out for this failure, cut short when the download stops."""
+        end_time = time.time() + self.retry_policy.record_failure(host, attempt, throttled, wait_hint)
+        while not self._is_stopped and time.time() < end_time:
+            time.sleep(max(0, min(0.2, end_time - time.time())))
+
+    def _checkpoint(self, start, position):
+        """Records the bytes queued since start in the journal, once the disk writer made them durable."""
+        if position <= start:
             return
-        
-        self.state.emit("Merging parts...")
-        output_file_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")
-        
-        merged_size = 0
-        chunk_size = 1024 * 1024 * 5 # 5MB Chunk
+        self.disk_writer.sync(lambda: self._mark_durable(start, position - 1))
 
-        with open(output_file_path, 'wb') as output_file:
-            for i in range(self.num_parts):
-                if i not in self.parts:
-                    self.state.emit(f"Error: Missing part {i}. Cannot combine files.")
-                    return
-                with open(self.parts[i], 'rb') as part_file:
-                    while True:
-                        chunk = part_file.read(chunk_size)
-                        if not chunk:
-                            break
-                        output_file.write(chunk)
-                        merged_size += len(chunk)
-                        if self.total_size > 0:
-                            progress_percentage = (merged_size / self.total_size) * 100
-                            self.progress.emit(int(progress_percentage))
+    def _mark_durable(self, start, end):
+        # Hashes first, a range in the journal must never be newer than the hashes of its blocks
+        self.block_hashes.save()
+        self.journal.mark_done(start, end)
+        self.journal.save()
+
+    def _is_archive_complete(self, file_size):
+        archive_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")
+        journal_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.journal.json")
+        # A preallocated archive always has the full size, only a missing journal means it is finished
+        return os.path.exists(archive_path) and os.path.getsize(archive_path) == file_size and not os.path.exists(journal_path)
+
+    def _prepare_archive(self, file_size, etag=None, last_modified=None):
+        """
+        Preallocates the archive and opens its journal, keeping every byte an earlier session already stored.
+        Kept bytes are verified against their block hashes, bad blocks go back into the journal as missing.
+        """
+        cache_path = os.path.join(os.getcwd(), "DownloadCache")
+        self.archive = ArchiveFile(os.path.join(cache_path, f"{self.current_hash}.rar"), file_size)
+        self.journal = DownloadJournal(os.path.join(cache_path, f"{self.current_hash}.journal.json"))
+        self.block_hashes = BlockHashes(os.path.join(cache_path, f"{self.current_hash}.blocks"))
+        resumed = True
+
+        if self._is_archive_complete(file_size):
+            # A finished archive of an earlier session is a resume with nothing missing
+            self.journal.reset(file_size, self.current_provider_key, etag, last_modified)
+            self.journal.mark_done(0, file_size - 1)
+        elif self.journal.exists() and os.path.exists(self.archive.path) and self.journal.load() and self.journal.matches(file_size, self.current_provider_key, etag, last_modified):
+            logging.info(f"Resuming archive, {self.journal.downloaded_bytes()} of {file_size} bytes already downloaded.")
+            self.journal.set_source(self.current_provider_key, etag, last_modified)
+        else:
+            self.journal.reset(file_size, self.current_provider_key, etag, last_modified)
+            resumed = False
+
+        if not resumed or not self.block_hashes.load(file_size):
+            self.block_hashes.reset(file_size)
 
-        for part_path in self.parts.values():
+        # Part files of the old merge based download and the old JSON hash list are not read anymore
+        for part_path in glob.glob(os.path.join(cache_path, f"{self.current_hash}_part_*")) + glob.glob(os.path.join(cache_path, f"{self.current_hash}.blocks.json")):
             try:
                 os.remove(part_path)
-            except Exception as e:
-                logging.error(f"Failed to delete part {part_path}: {e}", exc_info=True)
+            except OSError as e:
+                logging.error(f"Failed to delete old part {part_path}: {e}")
+
+        self.archive.preallocate()
+        if resumed:
+            self._verify_archive()
+        self.total_downloaded = self.journal.downloaded_bytes()
+
+    def _verify_archive(self):
+        """Checks every kept block with a known hash in one sequential read of the archive."""
+        blocks = [index for index in range(self.block_hashes.block_count()) if self.journal.covers(*self.block_hashes.block_range(index))]
+        if not self.block_hashes.known(blocks):
+            return
 
+        self.state.emit("Verifying archive...")
+        start_time = time.time()
+        bad = self.block_hashes.verify(self.archive.path, blocks, self.progress.emit)
+        logging.info(f"Verified {len(self.block_hashes.known(blocks))} blocks in {time.time() - start_time:.2f}s, {len(bad)} corrupt.")
+
+        if bad:
+            self.state.emit(f"Refetching {len(bad)} corrupt blocks...")
+            for index in bad:
+                self.journal.mark_missing(*self.block_hashes.block_range(index))
+                self.block_hashes.set(index, None)
+            self.block_hashes.save()
+            self.journal.save()
+
+    def _finish_archive(self):
+        if not self.journal.is_complete():
+            self.state.emit("Error: Download failed. Not all parts were downloaded.")
+            return False
+
+        self.journal.remove()
+        return True
+
+    def _segment_positions(self):
+        if not self.scheduler:
+            return {}
+        return {segment.index: segment.position for segment in list(self.scheduler.segments)}
+
+    def get_segment_stats(self):
+        """Per segment view for diagnostics and the Downloads tab, speeds are taken over the sampling window."""
+        if not self.scheduler:
+            return []
+        
+        time_diff, oldest_positions = 0, {}
+        if len(self.speed_samples) > 1:
+            time_diff = self.speed_samples[-1][0] - self.speed_samples[0][0]
+            oldest_positions = self.speed_samples[0][2]
+        
+        stats = []
+        for segment in list(self.scheduler.segments):
+            position = segment.position
+            before = oldest_positions.get(segment.index, segment.start)
+            stats.append({
+                "index": segment.index,
+                "start": segment.start,
+                "end": segment.end,
+                "downloaded": position - segment.start,
+                "remaining": segment.remaining(),
+                "active": segment.active,
+                "speed": (position - before) / time_diff if time_diff > 0 and segment.active else 0,
+            })
+        return stats
 
     def calculate_speed(self):
         current_time = time.time()
-        time_diff = current_time - self.last_report_time
+        if self.speed_samples and current_time - self.speed_samples[-1][0] < PROGRESS_REPORT_INTERVAL:
+            return
+        
+        written = self.disk_writer.written if self.disk_writer else 0
+        self.speed_samples.append((current_time, self.total_downloaded, self._segment_positions(), written))
+        oldest_time, oldest_bytes, _, oldest_written = self.speed_samples[0]
+        time_diff = current_time - oldest_time
+        if time_diff <= 0:
+            return
+
+        avg_speed = (self.total_downloaded - oldest_bytes) / time_diff
+        self.download_speed.emit(_format_speed(avg_speed))
+        # Network and disk only part ways when the disk falls behind and the writer queue fills up
+        self.disk_speed.emit(_format_speed(max(0, written - oldest_written) / time_diff))
+        self.segment_speeds.emit([stat["speed"] for stat in self.get_segment_stats() if stat["active"]])
 
-        if time_diff >= 1:
-            speed = (self.total_downloaded - self.last_report_bytes) / time_diff
-            if not hasattr(self, "speed_history"):
-                self.speed_history = []
+        if avg_speed > 0:
+            remaining_bytes = self.total_size - self.total_downloaded
+            remaining_seconds = int(remaining_bytes / avg_speed)
 
-            self.speed_history.append(speed)
-            if len(self.speed_history) > 10:
-                self.speed_history.pop(0)
+            hours, rem = divmod(remaining_seconds, 3600)
+            minutes, seconds = divmod(rem, 60)
+            formatted_time = f"{hours:02}:{minutes:02}:{seconds:02}"
+        else:
+            formatted_time = "Calculating..."
+
+        self.estimated_time.emit(formatted_time)
+
+    def pause(self):
+        self._is_paused = True
+
+    def resume(self):
+        self._is_paused = False
+
+    def stop(self):
+        self._is_stopped = True
+
+class InstallThread(QThread):
+    """
+    Install stage of one downloaded archive: unpack it, move the game into Games and register it in games.json.
+    Runs apart from the DownloadThread, so the manager hands the download slot to the next item meanwhile.
+    """
+    progress = pyqtSignal(int)
+    state = pyqtSignal(str)
+    estimated_time = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, parent, url, current_hash, cached=False):
+        super().__init__()
+        self.my_parrent = parent
+        self.url = url
+        self.current_hash = current_hash
+        self.cached = cached
+        # Shared by the manager, unpacking is disk bound and two at once only slow each other down
+        self.install_slot = threading.Semaphore(1)
+        self.extractor_name = "auto"
+        self.extractor = None
+        self.extract_started = 0
+        self.extracted_bytes = 0
+        self.success = False
+        self.corrupt = False
+        self._is_stopped = False
+
+    def stop(self):
+        self._is_stopped = True
+        if self.extractor:
+            self.extractor.cancel()
 
-            avg_speed = sum(self.speed_history) / len(self.speed_history)
+    def run(self):
+        threading.current_thread().name = "InstallThread"
+        self.state.emit("Waiting to unpack...")
+        while not self.install_slot.acquire(timeout=0.5):
+            if self._is_stopped:
+                self.state.emit("Stopped.")
+                return
+        try:
+            if self._is_stopped:
+                self.state.emit("Stopped.")
+                return
+            self._install()
+        finally:
+            self.install_slot.release()
 
-            if avg_speed >= 1024**3:
-                readable_speed = f"{avg_speed / (1024**3):.2f} GB/s"
-            elif avg_speed >= 1024**2:
-                readable_speed = f"{avg_speed / (1024**2):.2f} MB/s"
-            elif avg_speed >= 1024:
-                readable_speed = f"{avg_speed / 1024:.2f} KB/s"
+    def _install(self):
+        self.state.emit(f"Unpacking...")
+        rar_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.rar")
+        blocks_path = os.path.join(os.getcwd(), "DownloadCache", f"{self.current_hash}.blocks")
+        
+        # Unpacked next to Games on its file system, installing is then one rename instead of a copy of the game
+        games_path = os.path.join(os.getcwd(), "Games")
+        final_path = os.path.join(games_path, self.current_hash)
+        folder_path = os.path.join(games_path, INSTALL_STAGING_FOLDER, self.current_hash)
+        replaced_path = f"{folder_path}.replaced"
+        
+        if os.path.exists(replaced_path):
+            if os.path.exists(final_path):
+                shutil.rmtree(replaced_path)
             else:
-                readable_speed = f"{avg_speed:.2f} B/s"
-            self.download_speed.emit(readable_speed)
+                # An earlier install stopped between both renames, its old game goes back in place
+                os.rename(replaced_path, final_path)
+        if os.path.exists(folder_path):
+            shutil.rmtree(folder_path)
+        
+        os.makedirs(folder_path)
+        self.extractor = find_extractor(rar_path, self.extractor_name)
+        if self.extractor is None:
+            self.state.emit("Error: No extractor installed for this archive.")
+            logging.error(f"None of {[backend.name for backend in EXTRACTORS]} is installed or reads {rar_path}.")
+            return
+        if self._is_stopped:
+            self.state.emit("Stopped.")
+            return
+        
+        logging.info(f"Unpacking {rar_path} with {self.extractor.name} ({self.extractor.executable})")
+        self.progress.emit(0)
+        self.extract_started = time.time()
+        extracted = self.extractor.extract(rar_path, folder_path, self._report_extraction)
+        elapsed = time.time() - self.extract_started
+        logging.info(f"{self.extractor.name} unpacked {_format_size(self.extracted_bytes)} in {elapsed:.1f}s ({_format_speed(self.extracted_bytes / elapsed if elapsed > 0 else 0)})")
 
-            if avg_speed > 0:
-                remaining_bytes = self.total_size - self.total_downloaded
-                remaining_seconds = int(remaining_bytes / avg_speed)
+        if self._is_stopped:
+            self.state.emit("Stopped.")
+            return
 
-                hours, rem = divmod(remaining_seconds, 3600)
-                minutes, seconds = divmod(rem, 60)
-                formatted_time = f"{hours:02}:{minutes:02}:{seconds:02}"
+        if not extracted:
+            if self.cached:
+                # The manager queues the item again, which downloads the archive anew
+                self.state.emit("Cache corrupt. Retrying...")
+                logging.warning("Unpacking failed on cached file. Deleting and retrying.")
+                try:
+                    os.remove(rar_path)
+                    BlockHashes(blocks_path).remove()
+                except OSError:
+                    pass
+                self.corrupt = True
+                return
             else:
-                formatted_time = "Calculating..."
-
-            self.estimated_time.emit(formatted_time)
-
-            self.last_report_time = current_time
-            self.last_report_bytes = self.total_downloaded
-
-    def pause(self):
-        self._is_paused = True
-
-    def resume(self):
-        self._is_paused = False
-
-    def stop(self):
-        self._is_stopped = True
+                self.state.emit("Unpacking failed.")
+                logging.error("Unpacking failed.")
+                return
 
-class DownloadManager(QWidget):
-    def __init__(self, parent):
-        super().__init__()
-        self.my_parent = parent
-        self.cookies = {}
-        self.is_downloading = False
-        self.download_queue = []
-        self.current_download = None
-        self.userconfig = UserConfig(CONFIG_FOLDER, "userconfig.json")
+        rename_path = None
+        for file in os.listdir(folder_path):
+            if file == "_CommonRedist":
+                continue
+            if os.path.isdir(os.path.join(folder_path, file)):
+                rename_path = os.path.join(folder_path, file)
         
-        # Initialize DownloadThread
-        self.download_thread = DownloadThread(parent)
-        self.download_thread.cookies = self.cookies
-        self.download_thread.finished.connect(self._thread_finished)
-        self.download_thread.started.connect(self._thread_started)
-        self.download_thread.progress.connect(self._update_progress)
-        self.download_thread.state.connect(self._update_state)
-        self.download_thread.download_speed.connect(self._update_speed)
-        self.download_thread.estimated_time.connect(self._update_estimated_time)
+        if not rename_path:
+            self.state.emit("Error: Game folder not found.")
+            logging.error("Unpacking successful but no game folder found.")
+            return
 
-        self.init_ui()
-        self._load_queue()
-        self._update_queue_list()
+        try:
+            self._promote(rename_path, final_path, replaced_path)
+        except OSError as e:
+             self.state.emit(f"Error moving files: {e}")
+             logging.error(f"Error moving files: {e}")
+             return
         
-        if self.download_queue:
-            self._process_queue()
+        exe_path = _game_naming(self.current_hash)
+        logging.debug(exe_path)
+        if not exe_path:
+            # Registered anyway, the executable can be picked in the library
+            logging.warning(f"No executable found in {final_path}.")
+        elif not self.current_hash in exe_path:
+            # The folder below Games is the hash, whichever separator the path was built with
+            parts = os.path.normpath(exe_path).split(os.sep)
+            if len(parts) > 2:
+                parts[1] = self.current_hash
+                exe_path = os.path.join(*parts)
+        data = load_json(os.path.join(CONFIG_FOLDER, "games.json"))
+        if not self.current_hash in data.keys():
+            data[self.current_hash] = {"args": [], "exe": exe_path, "name": self.current_hash, "alias": get_name_from_url(self.url), "link": self.url, "version": _get_version_steamrip(self.url, self.my_parrent.scraper), "categorys": [], "playtime": 0}
+        else:
+            data[self.current_hash]["exe"] = exe_path
+            data[self.current_hash]["version"] = _get_version_steamrip(self.url, self.my_parrent.scraper)
 
-    def init_ui(self):
-        self._apply_stylesheet()
+        save_json(os.path.join(CONFIG_FOLDER, "games.json"), data)
         
-        # Main Layout
-        main_layout = QVBoxLayout(self)
-        main_layout.setSpacing(25)
-        main_layout.setContentsMargins(30, 30, 30, 30)
+        try:
+            shutil.rmtree(folder_path)
+            if os.path.exists(replaced_path):
+                shutil.rmtree(replaced_path)
+            os.remove(rar_path)
+            BlockHashes(blocks_path).remove()
+        except Exception as e:
+            logging.warning(f"Cleanup failed: {e}")
 
-        # --- Header Section ---
-        header_layout = QHBoxLayout()
-        title_label = QLabel("Downloads")
-        title_label.setObjectName("header_title")
-        header_layout.addWidget(title_label)
-        header_layout.addStretch()
-        main_layout.addLayout(header_layout)
+        self.state.emit(f"Finished")
+        self.success = True
+        self.finished.emit()
 
-        # --- Active Download Card ---
-        self.active_card = QFrame()
-        self.active_card.setObjectName("active_card")
+    def _report_extraction(self, done_bytes, done_files, total_bytes, total_files):
+        self.extracted_bytes = done_bytes
+        if total_bytes:
+            percent = int(done_bytes * 100 / total_bytes)
+        else:
+            percent = int(done_files * 100 / total_files) if total_files else 0
+        self.progress.emit(percent)
+        self.state.emit(f"Unpacking... {done_files}/{total_files} files")
         
-        active_layout = QVBoxLayout(self.active_card)
-        active_layout.setContentsMargins(20, 20, 20, 20)
-        active_layout.setSpacing(15)
+        if percent > 0:
+            elapsed_time = time.time() - self.extract_started
+            remaining_time = elapsed_time / (percent / 100) - elapsed_time
+            
+            hours, rem = divmod(remaining_time, 3600)
+            minutes, seconds = divmod(rem, 60)
+            self.estimated_time.emit(f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}")
 
-        # Active Download Title
-        self.active_title_label = QLabel("No Active Download")
-        self.active_title_label.setObjectName("active_title")
-        active_layout.addWidget(self.active_title_label)
+    @staticmethod
+    def _promote(source, target, replaced_path):
+        """
+        Puts the unpacked game in place with renames only. An earlier install is moved aside first and
+        only deleted with the staging folder, if the new one can not take its place it is moved back.
+        """
+        if os.path.exists(target):
+            os.rename(target, replaced_path)
+        try:
+            os.rename(source, target)
+        except OSError:
+            if os.path.exists(replaced_path):
+                os.rename(replaced_path, target)
+            raise
+
+class ActiveDownloadCard(QFrame):
+    """Card of one active (or stopped) download in the Downloads tab, bound to its own DownloadThread."""
+    def __init__(self, manager, item):
+        super().__init__()
+        self.manager = manager
+        self.item = item
+        self.thread = None
+        self.installer = None
+        self.ended = False
+        self.requeue = False
+        self.setObjectName("active_card")
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        # Title
+        self.title_label = QLabel(item.get("alias", get_name_from_url(item["url"])))
+        self.title_label.setObjectName("active_title")
+        layout.addWidget(self.title_label)
 
         # Progress Bar
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
         self.progress_bar.setTextVisible(False)
-        active_layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_bar)
 
         # Stats Row (Speed, ETA, Status)
         stats_layout = QHBoxLayout()
@@ -1297,18 +2002,28 @@ class DownloadManager(QWidget):
         self.speed_label = QLabel("0 KB/s")
         self.speed_label.setObjectName("stat_label")
         
+        self.disk_label = QLabel("")
+        self.disk_label.setObjectName("stat_label")
+        
         self.eta_label = QLabel("--:--:--")
         self.eta_label.setObjectName("stat_label")
         
-        self.status_detail_label = QLabel("Waiting...")
+        self.status_detail_label = QLabel("Starting...")
         self.status_detail_label.setObjectName("stat_label")
         self.status_detail_label.setAlignment(Qt.AlignRight)
 
         stats_layout.addWidget(self.speed_label)
+        stats_layout.addWidget(self.disk_label)
         stats_layout.addWidget(self.eta_label)
         stats_layout.addStretch()
         stats_layout.addWidget(self.status_detail_label)
-        active_layout.addLayout(stats_layout)
+        layout.addLayout(stats_layout)
+
+        # Per connection speeds
+        self.segments_label = QLabel("")
+        self.segments_label.setObjectName("hint_label")
+        self.segments_label.setWordWrap(True)
+        layout.addWidget(self.segments_label)
 
         # Controls Row
         controls_layout = QHBoxLayout()
@@ -1319,26 +2034,171 @@ class DownloadManager(QWidget):
         
         for btn in [self.pause_button, self.resume_button, self.stop_button]:
             btn.setCursor(Qt.PointingHandCursor)
+            controls_layout.addWidget(btn)
+        controls_layout.addStretch()
 
         self.pause_button.clicked.connect(self.pause)
         self.resume_button.clicked.connect(self.resume)
         self.stop_button.clicked.connect(self.stop)
+        layout.addLayout(controls_layout)
+
+    def bind(self, thread):
+        self.thread = thread
+        self.ended = False
+        self.requeue = False
+        thread.finished.connect(self._thread_finished)
+        thread.started.connect(self._thread_started)
+        thread.progress.connect(self._update_progress)
+        thread.state.connect(self._update_state)
+        thread.download_speed.connect(self._update_speed)
+        thread.disk_speed.connect(self._update_disk_speed)
+        thread.estimated_time.connect(self._update_estimated_time)
+        thread.segment_speeds.connect(self._update_segment_speeds)
+        
+        self.status_detail_label.setText("Starting...")
+        self.resume_button.setEnabled(False)
+        self.pause_button.setEnabled(True)
+        self.stop_button.setEnabled(True)
 
-        # Initial states
+    def install(self, installer):
+        """Follows the install stage of the item once its DownloadThread handed the archive over."""
+        self.installer = installer
+        installer.finished.connect(self._install_finished)
+        installer.progress.connect(self._update_progress)
+        installer.state.connect(self._update_state)
+        installer.estimated_time.connect(self._update_estimated_time)
+        
+        self.speed_label.setText("")
+        self.disk_label.setText("")
+        self.segments_label.setText("")
+        # An unpacking archive can only be stopped, it is unpacked again from the start
+        self.pause_button.setEnabled(False)
+        self.resume_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+
+    def show_queued(self):
         self.pause_button.setEnabled(False)
         self.resume_button.setEnabled(False)
         self.stop_button.setEnabled(False)
+        self.status_detail_label.setText("Queued")
 
-        controls_layout.addWidget(self.pause_button)
-        controls_layout.addWidget(self.resume_button)
-        controls_layout.addWidget(self.stop_button)
-        controls_layout.addStretch()
+    def show_ended(self):
+        # Download failed or stopped - Keep in queue
+        self.pause_button.setEnabled(False)
+        self.resume_button.setEnabled(True) # Enable to allow restart
+        self.stop_button.setEnabled(False)
+        self.status_detail_label.setText("Stopped/Failed")
+        self.segments_label.setText("")
+
+    def pause(self):
+        if self.thread:
+            self.thread.pause()
+        self.pause_button.setEnabled(False)
+        self.resume_button.setEnabled(True)
+        self.stop_button.setEnabled(True)
+        self.status_detail_label.setText("Paused")
+
+    def resume(self):
+        if self.thread and self.thread.isRunning():
+            self.thread.resume()
+            self.status_detail_label.setText("Resumed")
+            self.resume_button.setEnabled(False)
+            self.pause_button.setEnabled(True)
+            self.stop_button.setEnabled(True)
+        else:
+            # A dead thread waits for a free slot like any queued item
+            logging.info("Restarting download...")
+            self.manager._requeue(self)
+
+    def stop(self):
+        if self.installer:
+            self.installer.stop()
+        elif self.thread:
+            self.thread.stop()
+        self.stop_button.setEnabled(False)
+        self.pause_button.setEnabled(False)
+        self.resume_button.setEnabled(False)
+        self.status_detail_label.setText("Stopping...")
+
+    def _thread_finished(self):
+        self.manager._download_ended(self)
+
+    def _install_finished(self):
+        self.manager._install_ended(self)
+
+    def _thread_started(self):
+        logging.debug(f"Download thread started: {self.item['url']}")
+
+    def _update_progress(self, value):
+        self.progress_bar.setValue(value)
+    
+    def _update_state(self, state):
+        self.status_detail_label.setText(state)
+    
+    def _update_speed(self, speed):
+        self.speed_label.setText(f"🚀 {speed}")
+    
+    def _update_disk_speed(self, speed):
+        self.disk_label.setText(f"💾 {speed}")
+    
+    def _update_estimated_time(self, estimated_time):
+        self.eta_label.setText(f"⏱ {estimated_time}")
+    
+    def _update_segment_speeds(self, speeds):
+        active = [speed for speed in speeds if speed > 0]
+        if not active:
+            self.segments_label.setText("")
+            return
+        self.segments_label.setText(f"{len(active)} connections: " + "  ·  ".join(_format_speed(speed) for speed in active))
+
+DOWNLOAD_POLL_INTERVAL_MS = 1000
+
+class DownloadManager(QWidget):
+    def __init__(self, parent):
+        super().__init__()
+        self.my_parent = parent
+        self.cookies = {}
+        self.download_queue = []
+        self.active_downloads = {}
+        self._listed_items = []
+        self.userconfig = UserConfig(CONFIG_FOLDER, "userconfig.json")
+        # Shared by every DownloadThread, so the speed cap and the connection count are global
+        self.bandwidth_limiter = TokenBucket(int(self.userconfig.DOWNLOAD_SPEED) * 1024)
+        self.connection_budget = ConnectionBudget(int(self.userconfig.MAX_CONNECTIONS))
+        self.session_pool = SessionPool()
+        self.retry_policy = RetryPolicy()
+        self.disk_space = DiskSpaceLedger()
+        self.install_slot = threading.Semaphore(1)
+        self.link_prefetcher = LinkPrefetcher(parent.scraper)
+
+        self.init_ui()
+        self._load_queue()
+        self._update_queue_list()
+        
+        # Threads only report success, so ended downloads and free slots are picked up by polling
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self._poll_downloads)
+        self.poll_timer.start(DOWNLOAD_POLL_INTERVAL_MS)
+        
+        if self.download_queue:
+            self._process_queue()
+
+    def init_ui(self):
+        self._apply_stylesheet()
         
-        # Speed Limit Input
-        speed_container = QWidget()
-        speed_layout = QHBoxLayout(speed_container)
-        speed_layout.setContentsMargins(0,0,0,0)
+        # Main Layout
+        main_layout = QVBoxLayout(self)
+        main_layout.setSpacing(25)
+        main_layout.setContentsMargins(30, 30, 30, 30)
+
+        # --- Header Section ---
+        header_layout = QHBoxLayout()
+        title_label = QLabel("Downloads")
+        title_label.setObjectName("header_title")
+        header_layout.addWidget(title_label)
+        header_layout.addStretch()
         
+        # Speed Limit Input, applies to all active downloads together
         speed_lbl = QLabel("Max Speed (KB/s):")
         speed_lbl.setObjectName("stat_label")
         
@@ -1349,13 +2209,23 @@ class DownloadManager(QWidget):
         self.speed_input.setText(str(self.userconfig.DOWNLOAD_SPEED))
         self.speed_input.textChanged.connect(self.set_max_speed_from_input)
         
-        speed_layout.addWidget(speed_lbl)
-        speed_layout.addWidget(self.speed_input)
-        
-        controls_layout.addWidget(speed_container)
-        active_layout.addLayout(controls_layout)
+        header_layout.addWidget(speed_lbl)
+        header_layout.addWidget(self.speed_input)
+        main_layout.addLayout(header_layout)
 
-        main_layout.addWidget(self.active_card)
+        # --- Active Download Cards ---
+        self.idle_card = QFrame()
+        self.idle_card.setObjectName("active_card")
+        idle_layout = QVBoxLayout(self.idle_card)
+        idle_layout.setContentsMargins(20, 20, 20, 20)
+        idle_label = QLabel("No Active Download")
+        idle_label.setObjectName("active_title")
+        idle_layout.addWidget(idle_label)
+        main_layout.addWidget(self.idle_card)
+
+        self.active_layout = QVBoxLayout()
+        self.active_layout.setSpacing(15)
+        main_layout.addLayout(self.active_layout)
 
         # --- Queue Section ---
         queue_label = QLabel("Queue")
@@ -1420,31 +2290,28 @@ class DownloadManager(QWidget):
 
     def _download_now_action(self):
         row = self.queue_list.currentRow()
-        if row < 0:
-            return
-            
-        offset = 1 if self.current_download else 0
-        real_index = row + offset
-        
-        if real_index >= len(self.download_queue):
+        if row < 0 or row >= len(self._listed_items):
             return
 
-        logging.info(f"Prioritizing item at index {real_index}")
+        item = self._listed_items[row]
+        logging.info(f"Prioritizing {item.get('url')}")
         
         # Move item to top
-        item = self.download_queue.pop(real_index)
+        self.download_queue.remove(item)
         self.download_queue.insert(0, item)
         self._save_queue()
         
-        # If something is downloading, we need to stop it so this new top item can start.
-        if self.is_downloading:
-             logging.info("Stopping current download to start prioritized item...")
-             self.should_process_queue_after_stop = True
-             self.stop()
+        # Without a free slot the lowest priority running download makes room, it goes back into the queue
+        running = self._running_cards()
+        if len(running) >= int(self.userconfig.MAX_DOWNLOADS):
+             victim = max(running, key=lambda card: self.download_queue.index(card.item))
+             logging.info(f"Stopping {victim.item.get('url')} to start prioritized item...")
+             victim.requeue = True
+             victim.stop()
         else:
              self._process_queue()
              
-        # Refresh UI (the now active item will be hidden, old active item will appear in list)
+        # Refresh UI
         self._update_queue_list()
 
     def _save_queue(self):
@@ -1458,34 +2325,51 @@ class DownloadManager(QWidget):
         except (FileNotFoundError, json.JSONDecodeError):
             self.download_queue = []
             self._save_queue()
+        
+        # Nothing is running right after start, stopped items are picked up again like before
+        for item in self.download_queue:
+            item["status"] = "queued"
+            item.pop("space_needed", None)
 
     def _update_queue_list(self):
+        # Items with a card (running or stopped) are shown above, the list only holds waiting ones
+        listed_items = [item for item in self.download_queue if item["url"] not in self.active_downloads]
+        rows = [(item["url"], self._queue_label(item)) for item in listed_items]
+        # The poll calls this every second, rebuilding an unchanged list would drop the selection and cut off a drag
+        if rows == [(self.queue_list.item(i).data(Qt.UserRole), self.queue_list.item(i).text()) for i in range(self.queue_list.count())]:
+            self._listed_items = listed_items
+            return
+        
         # Disconnect signal temporarily to prevent feedback loop
         try:
             self.queue_list.model().rowsMoved.disconnect(self._on_queue_order_changed)
         except TypeError:
             pass # Signal might not be connected yet
 
+        current = self.queue_list.currentItem()
+        selected_url = current.data(Qt.UserRole) if current else None
         self.queue_list.clear()
         
-        start_index = 0
-        if self.current_download:
-            start_index = 1
-            
-        for i in range(start_index, len(self.download_queue)):
-            item = self.download_queue[i]
-            self.queue_list.addItem(item.get("alias", get_name_from_url(item.get("url"))))
+        self._listed_items = listed_items
+        for url, label in rows:
+            list_item = QListWidgetItem(label)
+            list_item.setData(Qt.UserRole, url)
+            self.queue_list.addItem(list_item)
+            if url == selected_url:
+                self.queue_list.setCurrentItem(list_item)
             
         # Reconnect signal
         self.queue_list.model().rowsMoved.connect(self._on_queue_order_changed)
 
-    def start(self, url):
-        # 1. Check Current Download
-        if self.current_download and self.current_download.get("url") == url:
-            logging.info(f"Skipping duplicate add: {url} is currently downloading.")
-            return
+    @staticmethod
+    def _queue_label(item):
+        label = item.get("alias", get_name_from_url(item.get("url")))
+        if item.get("status") == "waiting_space":
+            label = f"{label}  (waiting for {_format_size(sum(item['space_needed'].values()))} of disk space)"
+        return label
 
-        # 2. Check Queue
+    def start(self, url):
+        # Check Queue, it also holds the active downloads
         for item in self.download_queue:
             if item.get("url") == url:
                 logging.info(f"Skipping duplicate add: {url} is already in queue.")
@@ -1500,81 +2384,162 @@ class DownloadManager(QWidget):
         self.download_queue.append(download_item)
         self._save_queue()
         
-        # Add to UI
-        self.queue_list.addItem(download_item.get("alias", get_name_from_url(url)))
-
-        if not self.is_downloading:
-            self._process_queue()
+        self._update_queue_list()
+        self._process_queue()
+
+    def _running_cards(self):
+        return [card for card in self.active_downloads.values() if card.thread and not card.ended]
+
+    def _has_capacity(self):
+        running = self._running_cards()
+        if len(running) >= int(self.userconfig.MAX_DOWNLOADS):
+            return False
+        if not running:
+            return True
+        # An item that still resolves its link has not claimed its connections yet
+        if any(not card.thread.transfer_started for card in running):
+            return False
+        return self.connection_budget.has_spare()
 
     def _process_queue(self):
-        if not self.download_queue:
-            self.active_title_label.setText("No Active Download")
-            self.status_detail_label.setText("Idle")
-            self.progress_bar.setValue(0)
-            self.speed_label.setText("🚀 0 KB/s")
-            self.eta_label.setText("⏱ --:--:--")
-            return
-        
-        # Always take the first item from the (potentially reordered) queue
-        self.current_download = self.download_queue[0]
-        url = self.current_download["url"]
-        game_name = get_name_from_url(url)
-        
-        self.is_downloading = True
-        self.active_title_label.setText(f"{game_name}")
-        self.status_detail_label.setText("Starting...")
+        """Starts queued items in queue order while there is a free slot and spare connection budget."""
+        for item in list(self.download_queue):
+            if not self._has_capacity():
+                break
+            # Held items get their slot back once what they were missing is free, later items do not wait for them
+            if item.get("status") == "waiting_space" and not self.disk_space.shortfall(item["space_needed"]):
+                item["status"] = "queued"
+                item.pop("space_needed")
+            if item.get("status", "queued") != "queued":
+                continue
+            # A stopped item that was resumed still has its card
+            self._start_download(item, self.active_downloads.get(item["url"]))
         
-        self.resume_button.setEnabled(False)
-        self.pause_button.setEnabled(True)
-        self.stop_button.setEnabled(True)
+        # Resolve the next waiting items while the running ones still download or unpack
+        waiting = [item["url"] for item in self.download_queue if item.get("status", "queued") == "queued"]
+        self.link_prefetcher.prefetch(waiting[:PREFETCH_LOOKAHEAD])
         
         self._update_queue_list()
+        self.idle_card.setVisible(not self.active_downloads)
 
-        # Create a new thread
-        self.download_thread = DownloadThread(self.my_parent)
-        self.download_thread.cookies = self.cookies
-        self.download_thread.set_params(url)
-        self.download_thread.finished.connect(self._thread_finished)
-        self.download_thread.started.connect(self._thread_started)
-        self.download_thread.progress.connect(self._update_progress)
-        self.download_thread.state.connect(self._update_state)
-        self.download_thread.download_speed.connect(self._update_speed)
-        self.download_thread.estimated_time.connect(self._update_estimated_time)
-        self.update_max_speed()
-        self.download_thread.start()
+    def _start_download(self, item, card=None):
+        url = item["url"]
+        if card is None:
+            card = ActiveDownloadCard(self, item)
+            self.active_layout.addWidget(card)
+            self.active_downloads[url] = card
+        
+        item["status"] = "downloading"
+        logging.info(f"Starting download {url} ({len(self._running_cards()) + 1} active)")
 
-    def _thread_finished(self):
-        self.is_downloading = False
-        success = self.download_thread.success
-        self.download_thread.cleanParams()
+        # Create a new thread
+        thread = DownloadThread(self.my_parent)
+        thread.cookies = self.cookies
+        thread.bandwidth_limiter = self.bandwidth_limiter
+        thread.connection_budget = self.connection_budget
+        thread.session_pool = self.session_pool
+        thread.retry_policy = self.retry_policy
+        thread.disk_space = self.disk_space
+        thread.race_providers = bool(self.userconfig.RACE_PROVIDERS)
+        thread.multi_source = bool(self.userconfig.MULTI_SOURCE)
+        thread.set_params(url, item)
+        thread.prefetched = self.link_prefetcher.take(url)
+        card.bind(thread)
+        thread.start()
         
-        if success:
-            self.current_download = None
-            if self.download_queue:
-                self.download_queue.pop(0)
+        self._update_queue_list()
+        self.idle_card.setVisible(False)
+
+    def _requeue(self, card):
+        """Puts a stopped item back into the queue, _process_queue restarts it once there is capacity."""
+        card.item["status"] = "queued"
+        card.show_queued()
+        self._save_queue()
+        self._process_queue()
+
+    def _installing_cards(self):
+        return [card for card in self.active_downloads.values() if card.installer]
+
+    def _poll_downloads(self):
+        for card in self._running_cards():
+            if not card.thread.isRunning():
+                self._download_ended(card)
+        for card in self._installing_cards():
+            if not card.installer.isRunning():
+                self._install_ended(card)
+        self._process_queue()
+
+    def _download_ended(self, card):
+        if card.ended:
+            return
+        card.ended = True
+        success = card.thread.success
+        space_needed = card.thread.space_needed
+        installer = card.thread.installer
+        card.thread.cleanParams()
+        
+        if installer is not None:
+            # The download slot is free for the next item while this one unpacks, its disk space stays reserved
+            logging.info(f"Download of {card.item['url']} complete, handing it to the install stage.")
+            card.item["status"] = "installing"
+            installer.install_slot = self.install_slot
+            installer.extractor_name = self.userconfig.EXTRACTOR
+            card.install(installer)
+            installer.start()
             self._save_queue()
-            self._update_queue_list()
-            
-            self.pause_button.setEnabled(False)
-            self.resume_button.setEnabled(False)
-            self.stop_button.setEnabled(False)
-            self.progress_bar.setValue(0)
-            self.speed_label.setText("0 KB/s")
-            self.eta_label.setText("--:--:--")
-            
             self._process_queue()
+            return
+        
+        self.disk_space.release(hash_url(card.item["url"]))
+        
+        if success or card.requeue or space_needed:
+            self.active_downloads.pop(card.item["url"], None)
+            self.active_layout.removeWidget(card)
+            card.deleteLater()
+
+        if success:
+            if card.item in self.download_queue:
+                self.download_queue.remove(card.item)
+        elif card.requeue:
+            logging.info("Download was stopped for a prioritized item, it goes back into the queue.")
+            card.item["status"] = "queued"
+        elif space_needed:
+            logging.info("Not enough disk space, the item waits in the queue until there is.")
+            card.item["status"] = "waiting_space"
+            card.item["space_needed"] = space_needed
         else:
-            # Download failed or stopped - Keep in queue
-            self.pause_button.setEnabled(False)
-            self.resume_button.setEnabled(True) # Enable to allow restart
-            self.stop_button.setEnabled(False)
             logging.info("Download stopped or failed. Item remains in queue for restart.")
-            self.status_detail_label.setText("Stopped/Failed")
+            card.item["status"] = "stopped"
+            card.show_ended()
+
+        self._save_queue()
+        self._process_queue()
 
-            if hasattr(self, 'should_process_queue_after_stop') and self.should_process_queue_after_stop:
-                self.should_process_queue_after_stop = False
-                logging.info("Auto-restarting queue for prioritized item...")
-                self._process_queue()
+    def _install_ended(self, card):
+        installer = card.installer
+        if installer is None:
+            return
+        card.installer = None
+        self.disk_space.release(hash_url(card.item["url"]))
+        
+        if installer.success or installer.corrupt:
+            self.active_downloads.pop(card.item["url"], None)
+            self.active_layout.removeWidget(card)
+            card.deleteLater()
+        
+        if installer.success:
+            if card.item in self.download_queue:
+                self.download_queue.remove(card.item)
+        elif installer.corrupt:
+            logging.info("Cached archive could not be unpacked, the item goes back into the queue to download it again.")
+            card.item["status"] = "queued"
+        else:
+            logging.info("Install stopped or failed. Item remains in queue for restart.")
+            card.item["status"] = "stopped"
+            card.show_ended()
+        
+        self._save_queue()
+        self._process_queue()
     
     def set_max_speed_from_input(self):
         speed = self.speed_input.text()
@@ -1584,71 +2549,42 @@ class DownloadManager(QWidget):
             self.update_max_speed()
     
     def update_max_speed(self):
-        if self.download_thread:
-            self.download_thread.max_speed = self.userconfig.DOWNLOAD_SPEED
+        # Every worker of every running thread draws from this bucket, so the new cap applies immediately
+        self.bandwidth_limiter.set_rate(int(self.userconfig.DOWNLOAD_SPEED) * 1024)
     
     def resume(self):
-        if self.download_thread.isRunning():
-            self.download_thread.resume()
-            self.status_detail_label.setText("Resumed")
-        else:
-            # Restart dead thread
-            logging.info("Restarting download...")
-            self._process_queue()
-            
-        self.resume_button.setEnabled(False)
-        self.pause_button.setEnabled(True)
-        self.stop_button.setEnabled(True)
+        # A card in the install stage has nothing to resume, restarting its download would unpack it twice
+        for card in list(self.active_downloads.values()):
+            if not card.installer:
+                card.resume()
     
     def stop(self):
-        if self.download_thread:
-            self.download_thread.stop()
-        self.stop_button.setEnabled(False)
-        self.pause_button.setEnabled(False)
-        self.resume_button.setEnabled(False)
-        self.status_detail_label.setText("Stopping...")
+        for card in self._running_cards() + self._installing_cards():
+            card.stop()
     
     def pause(self):
-        if self.download_thread:
-            self.download_thread.pause()
-        self.pause_button.setEnabled(False)
-        self.resume_button.setEnabled(True)
-        self.stop_button.setEnabled(True)
-        self.status_detail_label.setText("Paused")
-    
-    def _update_progress(self, value):
-        self.progress_bar.setValue(value)
-    
-    def _update_state(self, state):
-        self.status_detail_label.setText(state)
-    
-    def _update_speed(self, speed):
-        self.speed_label.setText(f"🚀 {speed}")
-    
-    def _update_estimated_time(self, estimated_time):
-        self.eta_label.setText(f"⏱ {estimated_time}")
+        for card in self._running_cards():
+            card.pause()
     
     def _remove_selected_item(self):
         current_row = self.queue_list.currentRow()
-        if current_row < 0:
+        if current_row < 0 or current_row >= len(self._listed_items):
             return
 
-        # Calculate actual index in self.download_queue
-        # If self.current_download exists, UI row 0 is Queue index 1.
-        offset = 1 if self.current_download else 0
-        real_index = current_row + offset
-
         # Remove from data
-        if real_index < len(self.download_queue):
-            removed_item = self.download_queue.pop(real_index)
+        removed_item = self._listed_items[current_row]
+        if removed_item in self.download_queue:
+            self.download_queue.remove(removed_item)
             url = removed_item.get('url')
             logging.info(f"Removed from queue: {removed_item.get('alias', 'Unknown')}")
             self._save_queue()
+            self.link_prefetcher.discard(url)
             
             # Delete Cache Files
             self._delete_cache_files(url)
         
         # Remove from UI
+        self._listed_items.pop(current_row)
         self.queue_list.takeItem(current_row)
 
     def _delete_cache_files(self, url):
@@ -1661,9 +2597,13 @@ class DownloadManager(QWidget):
             # Define patterns to delete
             targets = [
                 os.path.join(cache_path, f"{file_hash}.rar"),       # The archive
-                os.path.join(cache_path, f"{file_hash}"),           # The extraction folder
+                os.path.join(cache_path, f"{file_hash}.journal.json"),# The resume journal
+                os.path.join(cache_path, f"{file_hash}.blocks"),      # The block hashes
+                os.path.join(cache_path, f"{file_hash}.blocks.json"), # The block hashes of older versions
+                os.path.join(cache_path, f"{file_hash}"),           # The extraction folder of older versions
+                os.path.join(os.getcwd(), "Games", INSTALL_STAGING_FOLDER, file_hash), # The extraction folder
             ]
-            # Add part files
+            # Add part files of the old merge based download
             targets.extend(glob.glob(os.path.join(cache_path, f"{file_hash}_part_*")))
             
             for target in targets:
@@ -1679,28 +2619,17 @@ class DownloadManager(QWidget):
             logging.error(f"Error deleting cache files for {url}: {e}")
 
     def _on_queue_order_changed(self, parent, start, end, destination, row):
-        # Reconstruct the queue list from the UI order
-        new_queue = []
+        # Items with a card keep their place at the front, the waiting ones follow in the UI order
+        by_url = {item["url"]: item for item in self._listed_items}
+        new_queue = [item for item in self.download_queue if item["url"] in self.active_downloads]
         
-        # If there is an active download, it MUST remain at index 0
-        if self.current_download:
-            new_queue.append(self.current_download)
-            
+        self._listed_items = []
         for i in range(self.queue_list.count()):
-            item_text = self.queue_list.item(i).text()
-            # Find the matching item in the old queue (inefficient but functional for small lists)
-            for download_item in self.download_queue:
-                # Skip the active download when searching for UI items
-                if download_item == self.current_download:
-                    continue
-                    
-                if download_item.get("alias") == item_text or get_name_from_url(download_item.get("url")) == item_text:
-                    new_queue.append(download_item)
-                    break
+            download_item = by_url.get(self.queue_list.item(i).data(Qt.UserRole))
+            if download_item is not None:
+                self._listed_items.append(download_item)
         
-        # Only update if we reconstructed the full queue (or full queue minus lost duplicates)
-        # Note: If duplicate names exist, this might be slightly buggy, but 'alias' should be unique enough usually.
-        self.download_queue = new_queue
+        self.download_queue = new_queue + self._listed_items
         self._save_queue()
 
     def keyPressEvent(self, event):
@@ -1708,7 +2637,3 @@ class DownloadManager(QWidget):
             self._remove_selected_item()
         else:
             super().keyPressEvent(event)
-    
-    def _thread_started(self):
-        self.is_downloading = True
-        logging.debug("Download thread started.")
@@ -101,6 +101,9 @@ def update_game_configs(games_path="Games", username=None, language=None):
 
     # Walk through Games directory
     for root, dirs, files in os.walk(games_path):
+        # Hidden folders in Games like the install staging folder hold no finished game
+        if root == games_path:
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
         for file in files:
             process_file(os.path.join(root, file))
     
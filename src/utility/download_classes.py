@@ -0,0 +1,1192 @@
+import logging, os, errno, json, shutil, struct, threading, time, queue, hashlib, random, urllib.parse, requests
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+from .utility_functions import load_json, save_json
+from .utility_vars import CONFIG_FOLDER
+
+def _save_json_atomic(path, data):
+    """Writes data to a temp file, fsyncs it and swaps it in, so a crash never leaves a torn file."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+class ArchiveFile:
+    """The final <hash>.rar, preallocated once and written in place by every segment worker."""
+    def __init__(self, path, total_size):
+        self.path = path
+        self.total_size = total_size
+
+    def preallocate(self):
+        mode = "r+b" if os.path.exists(self.path) else "wb"
+        with open(self.path, mode) as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() != self.total_size:
+                logging.debug(f"ArchiveFile: Preallocating {self.path} at {self.total_size} bytes")
+                f.truncate(self.total_size)
+            # NTFS allocates on truncate, most Linux file systems only grow a sparse file and need fallocate
+            if hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, self.total_size)
+                except OSError as e:
+                    if e.errno == errno.ENOSPC:
+                        raise
+                    logging.debug(f"ArchiveFile: {self.path} stays sparse, fallocate is not supported: {e}")
+
+class DownloadJournal:
+    """
+    Crash-safe resume state of one archive, stored next to it in DownloadCache.
+    It records which byte ranges are on disk, independent of how many segments or which
+    provider wrote them, so a later session only fetches the missing bytes.
+    Workers only mark ranges they already fsynced, and every save is an atomic replace.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.total_size = 0
+        self.provider = None
+        self.etag = None
+        self.last_modified = None
+        self.completed = []
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self) -> bool:
+        try:
+            data = load_json(self.path)
+        except (ValueError, OSError) as e:
+            logging.warning(f"DownloadJournal: Could not read {self.path}: {e}")
+            return False
+
+        self.total_size = data.get("total_size", 0)
+        self.provider = data.get("provider")
+        self.etag = data.get("etag")
+        self.last_modified = data.get("last_modified")
+        self.completed = [list(r) for r in data.get("completed", [])]
+        return True
+
+    def matches(self, total_size, provider, etag=None, last_modified=None):
+        if self.total_size != total_size:
+            return False
+        # Validators are only comparable between links of the same provider
+        if provider == self.provider:
+            if etag and self.etag and etag != self.etag:
+                return False
+            if last_modified and self.last_modified and last_modified != self.last_modified:
+                return False
+        return True
+
+    def reset(self, total_size, provider, etag=None, last_modified=None):
+        self.total_size = total_size
+        self.completed = []
+        self.set_source(provider, etag, last_modified)
+
+    def set_source(self, provider, etag=None, last_modified=None):
+        self.provider = provider
+        self.etag = etag
+        self.last_modified = last_modified
+        self.save()
+
+    def mark_done(self, start, end):
+        """Adds the inclusive range start..end, merging it with its neighbours."""
+        with self._lock:
+            merged = []
+            for done_start, done_end in sorted(self.completed + [[start, end]]):
+                if merged and done_start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], done_end)
+                else:
+                    merged.append([done_start, done_end])
+            self.completed = merged
+
+    def mark_missing(self, start, end):
+        """Removes the inclusive range start..end again, used for blocks that failed verification."""
+        with self._lock:
+            remaining = []
+            for done_start, done_end in self.completed:
+                if done_end < start or done_start > end:
+                    remaining.append([done_start, done_end])
+                    continue
+                if done_start < start:
+                    remaining.append([done_start, start - 1])
+                if done_end > end:
+                    remaining.append([end + 1, done_end])
+            self.completed = remaining
+
+    def covers(self, start, end):
+        with self._lock:
+            return any(done_start <= start and end <= done_end for done_start, done_end in self.completed)
+
+    def missing_ranges(self):
+        with self._lock:
+            missing, position = [], 0
+            for done_start, done_end in self.completed:
+                if done_start > position:
+                    missing.append((position, done_start - 1))
+                position = max(position, done_end + 1)
+            if position < self.total_size:
+                missing.append((position, self.total_size - 1))
+            return missing
+
+    def downloaded_bytes(self):
+        with self._lock:
+            return sum(done_end - done_start + 1 for done_start, done_end in self.completed)
+
+    def is_complete(self):
+        return self.total_size > 0 and not self.missing_ranges()
+
+    def save(self):
+        with self._lock:
+            data = {
+                "total_size": self.total_size,
+                "provider": self.provider,
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "completed": self.completed,
+            }
+            _save_json_atomic(self.path, data)
+
+    def remove(self):
+        for path in (self.path, self.path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+HASH_READ_SIZE = 1024 * 1024
+
+# Every hash has a fixed slot behind the header, a checkpoint only writes the slots that changed
+BLOCK_HASHES_HEADER = struct.Struct("<8sQQ")
+BLOCK_HASHES_MAGIC = b"SRBLOCK1"
+BLOCK_HASH_SIZE = 20
+UNKNOWN_BLOCK_HASH = bytes(BLOCK_HASH_SIZE)
+
+class BlockHashes:
+    """
+    SHA-1 of every HASH_BLOCK_SIZE block of an archive, stored next to it as <hash>.blocks.
+    The hashes are taken from the bytes as they arrive and outlive the journal, so a resumed or
+    cached archive is verified with one sequential read and only its bad blocks are fetched again.
+    None marks a block whose hash is unknown, such a block is trusted like before.
+    """
+    def __init__(self, path, block_size=HASH_BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self.total_size = 0
+        self.hashes = []
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def stored_total_size(path):
+        """Archive size the hashes at path were taken for, None without a readable file."""
+        try:
+            with open(path, "rb") as f:
+                magic, total_size, _ = BLOCK_HASHES_HEADER.unpack(f.read(BLOCK_HASHES_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        return total_size if magic == BLOCK_HASHES_MAGIC else None
+
+    def load(self, total_size) -> bool:
+        """Loads the stored hashes, fails when they belong to another archive size or block size."""
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(BLOCK_HASHES_HEADER.size)
+                data = f.read()
+        except OSError as e:
+            logging.warning(f"BlockHashes: Could not read {self.path}: {e}")
+            return False
+
+        if len(header) != BLOCK_HASHES_HEADER.size or BLOCK_HASHES_HEADER.unpack(header) != (BLOCK_HASHES_MAGIC, total_size, self.block_size):
+            return False
+        self.total_size = total_size
+        if len(data) != self.block_count() * BLOCK_HASH_SIZE:
+            return False
+        digests = (data[offset:offset + BLOCK_HASH_SIZE] for offset in range(0, len(data), BLOCK_HASH_SIZE))
+        with self._lock:
+            self.hashes = [None if digest == UNKNOWN_BLOCK_HASH else digest.hex() for digest in digests]
+            self._dirty.clear()
+        return True
+
+    def reset(self, total_size):
+        with self._lock:
+            self.total_size = total_size
+            self.hashes = [None] * self.block_count()
+            self._dirty.clear()
+            # Zero filled slots read back as unknown hashes
+            with open(self.path, "wb") as f:
+                f.write(BLOCK_HASHES_HEADER.pack(BLOCK_HASHES_MAGIC, total_size, self.block_size))
+                f.truncate(BLOCK_HASHES_HEADER.size + self.block_count() * BLOCK_HASH_SIZE)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def block_count(self):
+        return -(-self.total_size // self.block_size)
+
+    def block_range(self, index):
+        start = index * self.block_size
+        return start, min(start + self.block_size, self.total_size) - 1
+
+    def block_length(self, index):
+        start, end = self.block_range(index)
+        return max(0, end - start + 1)
+
+    def set(self, index, digest):
+        with self._lock:
+            self.hashes[index] = digest
+            self._dirty.add(index)
+
+    def known(self, indices):
+        with self._lock:
+            return [index for index in indices if self.hashes[index] is not None]
+
+    def stream(self, archive_path, position):
+        return BlockStream(self, archive_path, position)
+
+    def verify(self, archive_path, indices, on_progress=None):
+        """Re-hashes the given blocks in one sequential pass and returns the indices that do not match."""
+        indices = sorted(self.known(indices))
+        bad, last_percent = [], -1
+        with open(archive_path, "rb") as f:
+            for done, index in enumerate(indices, 1):
+                start, end = self.block_range(index)
+                f.seek(start)
+                block_hash = hashlib.sha1()
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = f.read(min(HASH_READ_SIZE, remaining))
+                    if not data:
+                        break
+                    block_hash.update(data)
+                    remaining -= len(data)
+
+                if remaining > 0 or block_hash.hexdigest() != self.hashes[index]:
+                    bad.append(index)
+                percent = done * 100 // len(indices)
+                if on_progress and percent != last_percent:
+                    on_progress(percent)
+                    last_percent = percent
+        return bad
+
+    def save(self):
+        """Writes the hashes set since the last save into their slots and fsyncs them."""
+        # A torn slot after a crash only fails verification, its block is then fetched again
+        with self._lock:
+            if not self._dirty:
+                return
+            with open(self.path, "r+b") as f:
+                for index in sorted(self._dirty):
+                    digest = self.hashes[index]
+                    f.seek(BLOCK_HASHES_HEADER.size + index * BLOCK_HASH_SIZE)
+                    f.write(bytes.fromhex(digest) if digest else UNKNOWN_BLOCK_HASH)
+                f.flush()
+                os.fsync(f.fileno())
+            self._dirty.clear()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class BlockStream:
+    """
+    Hashes the bytes of one ranged request while they are written. A request that starts inside a
+    block (a resume or retry) first reads the part of that block which is already on disk.
+    """
+    def __init__(self, hashes, archive_path, position):
+        self.hashes = hashes
+        self._index = position // hashes.block_size
+        self._length = hashes.block_length(self._index)
+        self._hash = hashlib.sha1()
+        self._filled = position - self._index * hashes.block_size
+
+        if self._filled > 0:
+            with open(archive_path, "rb") as f:
+                f.seek(self._index * hashes.block_size)
+                self._hash.update(f.read(self._filled))
+
+    def update(self, data):
+        while len(data) and self._length > 0:
+            take = min(len(data), self._length - self._filled)
+            self._hash.update(data[:take])
+            self._filled += take
+            data = data[take:]
+
+            if self._filled == self._length:
+                self.hashes.set(self._index, self._hash.hexdigest())
+                self._index += 1
+                self._length = self.hashes.block_length(self._index)
+                self._hash = hashlib.sha1()
+                self._filled = 0
+
+# Splits land on hash block boundaries, so every block is written by one request
+MIN_SPLIT_BYTES = HASH_BLOCK_SIZE
+
+class Segment:
+    """
+    One byte range of the archive. position is only ever advanced by the worker that owns the
+    segment, so the downloaded byte counts need no lock of their own.
+    """
+    def __init__(self, index, start, end, position):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.position = position
+        self.active = False
+        self.failed = False
+
+    def remaining(self):
+        return max(0, self.end - self.position + 1)
+
+    def downloaded(self):
+        return self.position - self.start
+
+class SegmentScheduler:
+    """
+    Hands the missing byte ranges of an archive to the download workers.
+    A worker without an unclaimed range steals the back half of the largest active one,
+    so every connection stays busy until the last byte.
+    """
+    def __init__(self, ranges, total_size, min_split=MIN_SPLIT_BYTES, align=HASH_BLOCK_SIZE):
+        self.min_split = min_split
+        self.align = align
+        self.segments = [Segment(index, start, end, start) for index, (start, end) in enumerate(ranges)]
+        # Bytes that were already on disk when the scheduler was created
+        self.base_bytes = total_size - sum(end - start + 1 for start, end in ranges)
+        self._lock = threading.Lock()
+
+    def next_segment(self):
+        with self._lock:
+            for segment in self.segments:
+                if not segment.active and not segment.failed and segment.remaining() > 0:
+                    segment.active = True
+                    return segment
+
+            active = [segment for segment in self.segments if segment.active]
+            if not active:
+                return None
+
+            victim = max(active, key=lambda segment: segment.remaining())
+            if victim.remaining() < 2 * self.min_split:
+                return None
+
+            middle = victim.position + victim.remaining() // 2
+            middle -= middle % self.align
+            stolen = Segment(len(self.segments), middle, victim.end, middle)
+            stolen.active = True
+            victim.end = middle - 1
+            self.segments.append(stolen)
+
+            logging.debug(f"SegmentScheduler: Split segment {victim.index} at byte {middle}, new segment {stolen.index}")
+            return stolen
+
+    def claim(self, segment, length):
+        """Reserves up to length bytes at the segment position and returns how many still belong to it."""
+        with self._lock:
+            length = max(0, min(length, segment.end - segment.position + 1))
+            segment.position += length
+            return length
+
+    def downloaded_bytes(self):
+        """Aggregate view over all segments, includes the bytes of earlier sessions."""
+        return self.base_bytes + sum(segment.downloaded() for segment in list(self.segments))
+
+    def has_work(self):
+        with self._lock:
+            return any(not segment.failed and segment.remaining() > 0 for segment in self.segments)
+
+    def release(self, segment, failed=False):
+        with self._lock:
+            segment.active = False
+            segment.failed = failed
+
+def provider_host(url):
+    """Returns the registrable host of a direct link, s18.megadb.net and s3.megadb.net both map to megadb.net."""
+    host = urllib.parse.urlparse(url or "").hostname or ""
+    if host.replace(".", "").isdigit():
+        return host
+    return ".".join(host.split(".")[-2:])
+
+class ServerInfo:
+    """What a download host reported to probe_server, supports_ranges is only trusted from a real 206."""
+    def __init__(self):
+        self.total_size = 0
+        self.accept_ranges = False
+        self.etag = None
+        self.last_modified = None
+        self.range_status = None
+
+    @property
+    def supports_ranges(self):
+        return self.range_status == 206
+
+def probe_server(url, headers=None, payload=None, session=None, proxies=None, timeout=30):
+    """
+    Asks a host what it supports before any data is transferred. The HEAD gives size and validators,
+    the 1 byte range GET shows whether Range is actually honoured, since some hosts advertise
+    Accept-Ranges and still answer 200 with the full body.
+    """
+    http = session or requests
+    info = ServerInfo()
+
+    try:
+        response = http.head(url, headers=headers, data=payload, proxies=proxies, timeout=timeout, allow_redirects=True)
+        if response.ok:
+            info.total_size = int(response.headers.get("Content-Length", 0))
+            info.accept_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            info.etag = response.headers.get("ETag")
+            info.last_modified = response.headers.get("Last-Modified")
+        response.close()
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"probe_server: HEAD failed, relying on the range request: {e}")
+
+    range_headers = dict(headers) if headers else {}
+    range_headers["Range"] = "bytes=0-0"
+    response = http.get(url, headers=range_headers, data=payload, stream=True, proxies=proxies, timeout=timeout)
+    info.range_status = response.status_code
+
+    if response.status_code == 206:
+        # Content-Range: bytes 0-0/<total>
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if total.isdigit():
+            info.total_size = int(total)
+    elif response.status_code == 200 and not info.total_size:
+        info.total_size = int(response.headers.get("Content-Length", 0))
+    info.etag = info.etag or response.headers.get("ETag")
+    info.last_modified = info.last_modified or response.headers.get("Last-Modified")
+    response.close()
+
+    logging.info(f"probe_server: {provider_host(url)} size={info.total_size} accept_ranges={info.accept_ranges} range_status={info.range_status} etag={info.etag}")
+    return info
+
+def measure_throughput(url, headers=None, payload=None, session=None, seconds=4, proxies=None):
+    """Bytes/s of one ranged transfer that runs for about the given seconds, the received data is discarded."""
+    http = session or requests
+    range_headers = dict(headers) if headers else {}
+    range_headers["Range"] = "bytes=0-"
+    buffer = bytearray(RECEIVE_BUFFER_SIZE)
+    received_total = 0
+
+    with http.get(url, headers=range_headers, data=payload, stream=True, proxies=proxies, timeout=30) as response:
+        if response.status_code not in (200, 206):
+            return 0
+        # Timed from the first header, connection setup is paid once and says little about a long transfer
+        start_time = time.monotonic()
+        while time.monotonic() - start_time < seconds:
+            received = response.raw.readinto(buffer)
+            if not received:
+                break
+            received_total += received
+
+    elapsed = time.monotonic() - start_time
+    return received_total / elapsed if elapsed > 0 else 0
+
+def hash_remote_range(url, start, end, headers=None, payload=None, session=None, proxies=None, timeout=30):
+    """SHA-1 of the bytes start..end as a host serves them, None when it does not answer with exactly that range."""
+    http = session or requests
+    range_headers = dict(headers) if headers else {}
+    range_headers["Range"] = f"bytes={start}-{end}"
+    block_hash = hashlib.sha1()
+    received_total = 0
+
+    with http.get(url, headers=range_headers, data=payload, stream=True, proxies=proxies, timeout=timeout) as response:
+        if response.status_code != 206:
+            return None
+        for chunk in response.iter_content(HASH_READ_SIZE):
+            block_hash.update(chunk)
+            received_total += len(chunk)
+
+    return block_hash.hexdigest() if received_total == end - start + 1 else None
+
+LINK_CACHE_TTL = 60 * 60
+LINK_CACHE_MAX_AGE = 24 * 60 * 60
+
+class LinkCache:
+    """
+    Persistent cache of resolved direct links in CONFIG_FOLDER/links.json, keyed by page hash and provider.
+    Entries are only handed out within their TTL and the caller still validates them with a range probe,
+    so a restart skips the page scrape and the provider resolver while the last link is alive.
+    Every entry records the page version it was resolved for, a caller that knows the current version
+    never gets a link to an older build.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self._path = path or os.path.join(CONFIG_FOLDER, "links.json")
+
+    def get(self, page_hash, provider_key, ttl=LINK_CACHE_TTL, version=None):
+        with self._lock:
+            entry = self._load().get(f"{page_hash}:{provider_key}")
+        if entry is None or time.time() - entry.get("resolved_at", 0) > ttl:
+            return None
+        if version is not None and entry.get("version") != version:
+            return None
+        return entry
+
+    def store(self, page_hash, provider_key, request, links=None, version=None):
+        session = request.get("session")
+        entry = {
+            "url": request["url"],
+            "headers": request.get("headers") or {},
+            "payload": request.get("payload") or {},
+            # Sessions can not be stored, the cookies they collected while resolving can
+            "cookies": requests.utils.dict_from_cookiejar(session.cookies) if session is not None else None,
+            "links": links or {},
+            "version": version,
+            "resolved_at": time.time(),
+        }
+        with self._lock:
+            now = time.time()
+            data = {key: value for key, value in self._load().items() if now - value.get("resolved_at", 0) < LINK_CACHE_MAX_AGE}
+            data[f"{page_hash}:{provider_key}"] = entry
+            _save_json_atomic(self._path, data)
+
+    def discard(self, page_hash, provider_key):
+        with self._lock:
+            data = self._load()
+            if data.pop(f"{page_hash}:{provider_key}", None) is not None:
+                _save_json_atomic(self._path, data)
+
+    @staticmethod
+    def request_from(entry):
+        """Rebuilds the downloader request of an entry, including a session that carries its cookies."""
+        request = {"url": entry["url"], "headers": entry["headers"], "payload": entry["payload"], "method": "get"}
+        if entry.get("cookies") is not None:
+            session = requests.Session()
+            session.cookies.update(entry["cookies"])
+            request["session"] = session
+        return request
+
+    def _load(self):
+        try:
+            return load_json(self._path)
+        except (ValueError, OSError) as e:
+            logging.warning(f"LinkCache: Could not read {self._path}: {e}")
+            return {}
+
+HEALTH_KEEP = 0.7
+HEALTH_HALF_LIFE = 3 * 24 * 60 * 60
+PRIOR_RESOLVE_SECONDS = 30
+PRIOR_THROUGHPUT = 8 * 1024 * 1024
+PRIOR_SUCCESS_RATE = 0.9
+
+class ProviderHealth:
+    """
+    Decayed statistics per provider in CONFIG_FOLDER/providers.json: resolve latency, success rate and
+    sustained throughput. Every new sample is blended in with a weight that grows with the age of the old
+    value, so a provider that was slow last week is tried again. Unknown values fall back to priors.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self._path = path or os.path.join(CONFIG_FOLDER, "providers.json")
+
+    def record_resolve(self, provider_key, seconds, success):
+        with self._lock:
+            data = self._load()
+            stats = data.setdefault(provider_key, {})
+            self._blend(stats, "success_rate", 1.0 if success else 0.0)
+            if success:
+                self._blend(stats, "resolve_seconds", seconds)
+            save_json(self._path, data)
+
+    def record_transfer(self, provider_key, success=None, throughput=None):
+        """A success of None (a transfer the user stopped) only contributes its throughput."""
+        with self._lock:
+            data = self._load()
+            stats = data.setdefault(provider_key, {})
+            if success is not None:
+                self._blend(stats, "success_rate", 1.0 if success else 0.0)
+            if throughput:
+                self._blend(stats, "throughput", throughput)
+            save_json(self._path, data)
+
+    def expected_time(self, provider_key, size):
+        """Expected seconds until size bytes are on disk, failed attempts make a provider proportionally slower."""
+        with self._lock:
+            stats = self._load().get(provider_key, {})
+        resolve_seconds = stats.get("resolve_seconds", PRIOR_RESOLVE_SECONDS)
+        throughput = max(1, stats.get("throughput", PRIOR_THROUGHPUT))
+        success_rate = max(0.05, stats.get("success_rate", PRIOR_SUCCESS_RATE))
+        return (resolve_seconds + size / throughput) / success_rate
+
+    @staticmethod
+    def _blend(stats, field, value):
+        now = time.time()
+        if field not in stats:
+            stats[field] = value
+        else:
+            keep = HEALTH_KEEP * 0.5 ** ((now - stats.get(f"{field}_at", now)) / HEALTH_HALF_LIFE)
+            stats[field] = stats[field] * keep + value * (1 - keep)
+        stats[f"{field}_at"] = now
+
+    def _load(self):
+        try:
+            return load_json(self._path)
+        except (ValueError, OSError) as e:
+            logging.warning(f"ProviderHealth: Could not read {self._path}: {e}")
+            return {}
+
+class ConnectionController:
+    """
+    AIMD controller for the number of parallel connections to one provider host.
+    It adds a connection while the aggregate throughput keeps rising and backs off multiplicatively
+    on throttling (429/503) or falling per-connection speed. The best count is remembered per host.
+    """
+    INCREASE_THRESHOLD = 1.05
+    THROTTLE_FACTOR = 0.5
+    SLOWDOWN_FACTOR = 0.75
+    # connections.json is shared by every active download, the instance lock only guards the target
+    _file_lock = threading.Lock()
+
+    def __init__(self, host, initial, minimum=1, maximum=16, path=None):
+        self.host = host
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        # Share of the global ConnectionBudget, equal to the maximum until a budget lowers it
+        self.limit = self.maximum
+        self._path = path or os.path.join(CONFIG_FOLDER, "connections.json")
+        self._lock = threading.Lock()
+        self._throttled = False
+        self._last_throughput = 0
+        self._last_per_connection = 0
+
+        with self._file_lock:
+            learned = self._load().get(host, {})
+        self.target = self._clamp(learned.get("connections", initial))
+        self.best_target = self.target
+        self.best_throughput = 0
+
+        logging.info(f"ConnectionController: {host} starts with {self.target} connections (learned: {'connections' in learned})")
+
+    def _clamp(self, value):
+        return max(self.minimum, min(self.maximum, self.limit, int(value)))
+
+    def set_limit(self, limit):
+        with self._lock:
+            self.limit = max(self.minimum, limit)
+            self.target = self._clamp(self.target)
+
+    def report_throttle(self):
+        self._throttled = True
+
+    def update(self, throughput):
+        """Feeds the aggregate throughput of the last interval in bytes/s and returns the new connection target."""
+        with self._lock:
+            current = self.target
+            per_connection = throughput / current
+
+            if throughput > self.best_throughput:
+                self.best_throughput = throughput
+                self.best_target = current
+
+            if self._throttled:
+                self.target = self._clamp(current * self.THROTTLE_FACTOR)
+                self._throttled = False
+            elif throughput > self._last_throughput * self.INCREASE_THRESHOLD:
+                self.target = self._clamp(current + 1)
+            elif throughput < self._last_throughput and per_connection < self._last_per_connection * self.SLOWDOWN_FACTOR:
+                self.target = self._clamp(current * self.SLOWDOWN_FACTOR)
+
+            if self.target != current:
+                logging.debug(f"ConnectionController: {self.host} {throughput / 1024**2:.2f} MB/s with {current} connections -> {self.target}")
+
+            self._last_throughput = throughput
+            self._last_per_connection = per_connection
+            return self.target
+
+    def save(self):
+        if self.best_throughput <= 0:
+            return
+        with self._file_lock:
+            data = self._load()
+            data[self.host] = {"connections": self.best_target, "throughput": int(self.best_throughput)}
+            _save_json_atomic(self._path, data)
+
+    def _load(self):
+        try:
+            return load_json(self._path)
+        except (ValueError, OSError) as e:
+            logging.warning(f"ConnectionController: Could not read {self._path}: {e}")
+            return {}
+
+class ConnectionBudget:
+    """
+    Global number of connections shared by all active downloads, a total of 0 means unlimited.
+    Every registered controller gets a max-min fair share, so a download capped below its share
+    (1fichier allows a single connection) leaves the rest to the others.
+    """
+    def __init__(self, total=0):
+        self._lock = threading.Lock()
+        self._controllers = []
+        self.total = max(0, total)
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = max(0, total)
+            self._rebalance()
+
+    def register(self, controller):
+        with self._lock:
+            self._controllers.append(controller)
+            self._rebalance()
+
+    def unregister(self, controller):
+        with self._lock:
+            if controller in self._controllers:
+                self._controllers.remove(controller)
+            controller.set_limit(controller.maximum)
+            self._rebalance()
+
+    def has_spare(self):
+        """True while the active downloads use fewer connections than the budget allows."""
+        with self._lock:
+            return self.total <= 0 or sum(controller.target for controller in self._controllers) < self.total
+
+    def _rebalance(self):
+        if self.total <= 0:
+            for controller in self._controllers:
+                controller.set_limit(controller.maximum)
+            return
+
+        # Water filling, the smallest maximum is served first and its leftover goes to the rest
+        remaining = self.total
+        pending = sorted(self._controllers, key=lambda controller: controller.maximum)
+        while pending:
+            share = max(1, remaining // len(pending))
+            controller = pending.pop(0)
+            limit = min(controller.maximum, share)
+            controller.set_limit(limit)
+            remaining -= limit
+
+        logging.debug(f"ConnectionBudget: {self.total} connections split as {[(controller.host, controller.limit) for controller in self._controllers]}")
+
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 30
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 10
+BREAKER_MAX_COOLDOWN = 120
+BREAKER_FULL_ADMISSION = 8
+
+def retry_after(response):
+    """Seconds a 429/503 response asks the client to wait, None when it gives no usable Retry-After."""
+    value = response.headers.get("Retry-After", "").strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """
+    Retry decisions shared by the download workers of all hosts. Delays grow exponentially with full
+    jitter, so workers that failed together do not retry together, and a Retry-After of the host wins.
+    BREAKER_THRESHOLD failures on one host without a success in between open its circuit breaker: every
+    worker of that host waits out the cooldown, then they are let back in one, two, four... at a time.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                "state": "closed", "failures": 0, "open_until": 0, "cooldown": BREAKER_COOLDOWN, "allowance": 0, "admitted": 0,
+                "metrics": {"requests": 0, "retries": 0, "throttled": 0, "errors": 0, "breaker_opens": 0, "backoff_seconds": 0.0},
+            }
+        return state
+
+    def admit(self, host, is_stopped=lambda: False) -> bool:
+        """Blocks while the breaker of host keeps workers out, False when is_stopped turned true meanwhile."""
+        while not is_stopped():
+            with self._lock:
+                state = self._host(host)
+                now = time.time()
+                if state["state"] == "open" and now >= state["open_until"]:
+                    logging.info(f"RetryPolicy: {host} cooled down, letting workers back in gradually")
+                    state["state"], state["allowance"], state["admitted"] = "half_open", 1, 0
+                if state["state"] == "closed" or (state["state"] == "half_open" and state["admitted"] < state["allowance"]):
+                    state["admitted"] += 1
+                    state["metrics"]["requests"] += 1
+                    return True
+            time.sleep(0.2)
+        return False
+
+    def record_success(self, host):
+        with self._lock:
+            state = self._host(host)
+            state["failures"] = 0
+            if state["state"] == "half_open":
+                state["allowance"] *= 2
+                if state["allowance"] >= BREAKER_FULL_ADMISSION:
+                    logging.info(f"RetryPolicy: {host} recovered, closing its breaker")
+                    state["state"], state["cooldown"] = "closed", BREAKER_COOLDOWN
+
+    def record_failure(self, host, attempt, throttled=False, wait_hint=None) -> float:
+        """Counts a failed request and returns the seconds the worker should wait before its next attempt."""
+        with self._lock:
+            state = self._host(host)
+            metrics = state["metrics"]
+            metrics["retries"] += 1
+            metrics["throttled" if throttled else "errors"] += 1
+            state["failures"] += 1
+
+            if state["state"] == "half_open" or (state["state"] == "closed" and state["failures"] >= BREAKER_THRESHOLD):
+                # A failure while recovering means the host is not back yet, it stays out longer
+                if state["state"] == "half_open":
+                    state["cooldown"] = min(BREAKER_MAX_COOLDOWN, state["cooldown"] * 2)
+                state["state"], state["open_until"] = "open", time.time() + max(state["cooldown"], wait_hint or 0)
+                metrics["breaker_opens"] += 1
+                logging.warning(f"RetryPolicy: {host} failed {state['failures']} times in a row, pausing its workers for {state['open_until'] - time.time():.0f}s")
+
+            delay = wait_hint if wait_hint is not None else random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            metrics["backoff_seconds"] += delay
+            return delay
+
+    def is_open(self, host):
+        with self._lock:
+            return self._host(host)["state"] != "closed"
+
+    def reset(self, host):
+        """Closes the breaker of host, its failures belonged to a link that was just replaced."""
+        with self._lock:
+            state = self._host(host)
+            state["state"], state["failures"], state["cooldown"] = "closed", 0, BREAKER_COOLDOWN
+
+    def metrics(self, host=None):
+        """Retry counters per host, or of one host, for diagnostics."""
+        with self._lock:
+            if host is not None:
+                return dict(self._host(host)["metrics"])
+            return {name: dict(state["metrics"], breaker=state["state"]) for name, state in self._hosts.items()}
+
+class SessionPool:
+    """
+    One keep-alive requests.Session per download host, shared by every worker, retry and re-split segment
+    that talks to it. The adapter pool grows with the workers currently using the host, so connections are
+    reused instead of being discarded when the pool is full. Resolver cookies are merged into the session.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._users = {}
+        self._sizes = {}
+
+    def acquire(self, url, workers, cookies=None):
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = requests.Session()
+            self._users[host] = self._users.get(host, 0) + workers
+
+            # A new adapter only serves new requests, in-flight ones finish on the old pool
+            if self._users[host] > self._sizes.get(host, 0):
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._users[host])
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sizes[host] = self._users[host]
+
+            if cookies is not None:
+                session.cookies.update(cookies)
+            return session
+
+    def release(self, url, workers):
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            self._users[host] = self._users.get(host, 0) - workers
+            if self._users[host] <= 0:
+                self._users.pop(host)
+                self._sizes.pop(host, None)
+                session = self._sessions.pop(host, None)
+                if session is not None:
+                    session.close()
+
+DISK_SPACE_MARGIN = 1024**3
+# Game archives are mostly compressed already, the unpacked folder is about a third larger than the rar
+EXTRACT_FACTOR = 1.35
+
+def _existing_directory(path):
+    while not os.path.isdir(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+class DiskSpaceLedger:
+    """
+    Disk space that admitted downloads promised to themselves, per file system. An item is only admitted
+    when the free space minus the reservations of the others covers its needs plus DISK_SPACE_MARGIN, so
+    two large items can not both start on room only one of them fits into. Needs map a path to bytes.
+    """
+    def __init__(self, margin=DISK_SPACE_MARGIN):
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._reservations = {}
+
+    @staticmethod
+    def _by_device(needs):
+        devices = {}
+        for path, size in needs.items():
+            path = _existing_directory(path)
+            device = os.stat(path).st_dev
+            known_path, known_size = devices.get(device, (path, 0))
+            devices[device] = (known_path, known_size + size)
+        return devices
+
+    def _shortfall(self, needs, key=None):
+        shortfall = {}
+        for device, (path, size) in self._by_device(needs).items():
+            reserved = sum(self._by_device(other).get(device, (None, 0))[1] for other_key, other in self._reservations.items() if other_key != key)
+            missing = size + reserved + self.margin - shutil.disk_usage(path).free
+            if missing > 0:
+                shortfall[path] = missing
+        return shortfall
+
+    def shortfall(self, needs):
+        """Bytes missing per file system for needs, empty when they fit next to every reservation."""
+        with self._lock:
+            return self._shortfall(needs)
+
+    def reserve(self, key, needs):
+        """Reserves needs for key unless they do not fit, returns the shortfall like shortfall()."""
+        with self._lock:
+            shortfall = self._shortfall(needs, key)
+            if not shortfall:
+                self._reservations[key] = dict(needs)
+            return shortfall
+
+    def update(self, key, needs):
+        """Replaces the reservation of an admitted key, used once part of it is allocated on disk."""
+        with self._lock:
+            self._reservations[key] = dict(needs)
+
+    def release(self, key):
+        with self._lock:
+            self._reservations.pop(key, None)
+
+REFRESH_RETRY_INTERVAL = 60
+
+class DownloadSource:
+    """
+    One host that serves the archive: its direct link, what to send along with it and the connection
+    controller of that host. Mirrors of the same archive are further sources feeding one SegmentScheduler.
+    """
+    def __init__(self, provider_key, url, headers=None, payload=None, session=None, controller=None):
+        self.provider_key = provider_key
+        self.url = url
+        self.headers = headers
+        self.payload = payload
+        self.session = session
+        self.controller = controller
+        # Url the pooled session was acquired for, the link itself may change on a refresh
+        self.pooled_url = None
+        # Bumped by every successful link refresh, a worker whose failure is older just retries
+        self.generation = 0
+        self.refresh_lock = threading.Lock()
+        self.refresh_failed = None
+        self.executor = None
+        self.futures = []
+        # Ids of the workers currently running, the lowest ones up to the connection target download
+        self.workers = set()
+        self.failed = False
+        self.started_at = None
+        self.active_seconds = 0
+        self.downloaded = 0
+        self.last_downloaded = 0
+        self._lock = threading.Lock()
+
+    def add_bytes(self, amount):
+        with self._lock:
+            self.downloaded += amount
+
+    def worker_started(self, worker_id):
+        with self._lock:
+            self.workers.add(worker_id)
+
+    def worker_ended(self, worker_id, failed=False):
+        """Counts a worker out, a failed one takes the source down only when no other worker is left to take over."""
+        with self._lock:
+            self.workers.discard(worker_id)
+            if failed and not self.workers:
+                self.failed = True
+
+    def over_target(self, worker_id):
+        """
+        True while the worker is not among the lowest running ones up to the connection target, it then waits.
+        Workers are ranked instead of compared by id, so a waiting worker takes over the slot of one that exited.
+        """
+        with self._lock:
+            return sum(1 for other in self.workers if other < worker_id) >= self.controller.target
+
+RECEIVE_BUFFER_SIZE = 1024 * 1024
+MIN_READ_SIZE = 16 * 1024
+
+class BufferPool:
+    """Reusable receive buffers, so the download loop does not allocate a new bytes object per read."""
+    def __init__(self, size=RECEIVE_BUFFER_SIZE):
+        self.size = size
+        self._free = queue.SimpleQueue()
+
+    def acquire(self):
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return bytearray(self.size)
+
+    def release(self, buffer):
+        self._free.put(buffer)
+
+    @contextmanager
+    def borrow(self):
+        buffer = self.acquire()
+        view = memoryview(buffer)
+        try:
+            yield view
+        finally:
+            view.release()
+            self.release(buffer)
+
+WRITE_QUEUE_SIZE = 32
+WRITE_BATCH_SIZE = 64
+WRITE_COALESCE_BYTES = 8 * 1024 * 1024
+
+class DiskWriter:
+    """
+    Writes the received buffers of every worker to the archive on its own thread, so a stalling disk only
+    slows the network once WRITE_QUEUE_SIZE buffers are waiting. Queued buffers are sorted by offset and
+    go through one large file buffer, so buffers that continue each other become one sequential write.
+    sync() runs a callback once everything queued before it is on disk, the journal is updated from there.
+    """
+    def __init__(self, path, buffer_pool, max_pending=WRITE_QUEUE_SIZE):
+        self.path = path
+        self.buffer_pool = buffer_pool
+        self.written = 0
+        self.busy_seconds = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._position = None
+        self._thread = threading.Thread(target=self._run, name="DL_DiskWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, position, buffer, start, length):
+        """Queues buffer[start:start + length] for the archive offset position, the buffer goes back to the pool once written."""
+        if self.error is not None:
+            self.buffer_pool.release(buffer)
+            raise OSError(f"Writing {self.path} failed: {self.error}")
+        self._queue.put(("write", position, buffer, start, length))
+
+    def sync(self, callback):
+        """Calls callback on the writer thread once everything queued before is flushed and fsynced."""
+        self._queue.put(("sync", callback))
+
+    def flush(self):
+        """Blocks until everything queued so far reached the disk, or the writer failed."""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def throughput(self):
+        """Bytes/s the disk took while the writer was busy, independent of how fast the network delivers."""
+        return self.written / self.busy_seconds if self.busy_seconds > 0 else 0
+
+    def _run(self):
+        with open(self.path, "r+b", buffering=WRITE_COALESCE_BYTES) as f:
+            while True:
+                batch = [self._queue.get()]
+                # Everything that is already waiting, up to the next barrier, is written as one batch
+                while batch[-1] is not None and batch[-1][0] == "write" and len(batch) < WRITE_BATCH_SIZE:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                barrier = batch.pop() if batch[-1] is None or batch[-1][0] != "write" else ("none",)
+                start_time = time.perf_counter()
+                self._write_batch(f, sorted(batch, key=lambda item: item[1]))
+
+                if barrier is None:
+                    self._flush(f)
+                    return
+                if barrier[0] == "sync" and self._flush(f):
+                    try:
+                        barrier[1]()
+                    except Exception as e:
+                        logging.error(f"DiskWriter: Checkpoint of {self.path} failed: {e}", exc_info=True)
+                elif barrier[0] == "flush":
+                    self._flush(f)
+                    barrier[1].set()
+                self.busy_seconds += time.perf_counter() - start_time
+
+    def _write_batch(self, f, batch):
+        for _, position, buffer, start, length in batch:
+            try:
+                if self.error is None:
+                    if position != self._position:
+                        f.seek(position)
+                    f.write(memoryview(buffer)[start:start + length])
+                    self._position = position + length
+                    self.written += length
+            except OSError as e:
+                logging.error(f"DiskWriter: Writing {self.path} failed: {e}")
+                self.error = e
+            finally:
+                self.buffer_pool.release(buffer)
+
+    def _flush(self, f):
+        if self.error is not None:
+            return False
+        try:
+            f.flush()
+            os.fsync(f.fileno())
+            return True
+        except OSError as e:
+            logging.error(f"DiskWriter: Flushing {self.path} failed: {e}")
+            self.error = e
+            return False
+
+class TokenBucket:
+    """
+    Bandwidth limiter shared by every download worker, a rate of 0 means unlimited.
+    Workers may take more than is available and then sleep off the debt, which keeps the
+    aggregate rate exact regardless of the connection count or chunk size.
+    """
+    BURST_SECONDS = 0.25
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self._tokens = 0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Retunes the limiter in bytes/s, running workers pick the new rate up with their next chunk."""
+        with self._lock:
+            self.rate = max(0, rate)
+            self.capacity = self.rate * self.BURST_SECONDS
+            self._tokens = min(self._tokens, self.capacity)
+            self._last = time.monotonic()
+
+    def read_size(self, maximum):
+        """Largest read that keeps a capped stream smooth, about a tenth of a second of traffic."""
+        if self.rate <= 0:
+            return maximum
+        return max(MIN_READ_SIZE, min(maximum, int(self.rate / 10)))
+
+    def consume(self, amount):
+        with self._lock:
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if delay > 0:
+            time.sleep(delay)
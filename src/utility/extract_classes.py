@@ -0,0 +1,351 @@
+import abc, logging, os, re, shutil, struct, subprocess, zipfile, zlib
+
+from .utility_vars import APPDATA_CACHE_PATH
+
+TOOLS_FOLDER = os.path.join(APPDATA_CACHE_PATH, "Tools")
+
+# The cache names every archive .rar, the first bytes tell what it really is
+ARCHIVE_SIGNATURES = {
+    "rar": (b"Rar!\x1a\x07\x00", b"Rar!\x1a\x07\x01\x00"),
+    "zip": (b"PK\x03\x04", b"PK\x05\x06"),
+    "7z": (b"7z\xbc\xaf\x27\x1c",),
+}
+
+def archive_type(path):
+    with open(path, "rb") as f:
+        head = f.read(8)
+    for kind, signatures in ARCHIVE_SIGNATURES.items():
+        if head.startswith(signatures):
+            return kind
+    return None
+
+def _read_vint(data, pos):
+    """RAR 5 variable length integer, 7 bits per byte with the high bit set on every byte but the last."""
+    value, shift = 0, 0
+    while pos < len(data):
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+    raise ValueError("header ends inside a number")
+
+def _validate_rar5(f, size):
+    pos = 8
+    while pos < size:
+        f.seek(pos)
+        head = f.read(7)
+        if len(head) < 5:
+            return "ends inside a header"
+        header_size, data_start = _read_vint(head, 4)
+        # Type and flags take at least two bytes, a smaller size would make the read below read the whole archive
+        if header_size < 2:
+            return f"has a damaged header at byte {pos}"
+        block = head + f.read(max(0, data_start + header_size - len(head)))
+        if len(block) < data_start + header_size:
+            return "ends inside a header"
+        if zlib.crc32(block[4:]) != struct.unpack("<I", block[:4])[0]:
+            return f"has a damaged header at byte {pos}"
+        header_type, field = _read_vint(block, data_start)
+        flags, field = _read_vint(block, field)
+        data_size = 0
+        if flags & 0x0001:
+            _, field = _read_vint(block, field)
+        if flags & 0x0002:
+            data_size, field = _read_vint(block, field)
+        if header_type == 4:
+            # Encrypted headers can not be walked without the password
+            return None
+        if header_type == 5:
+            end_flags, _ = _read_vint(block, field)
+            return "is one volume of a multi part archive" if end_flags & 0x0001 else None
+        pos += len(block) + data_size
+    return "ends before its end of archive marker"
+
+# File header flags that only RAR 2.9 and later write: unicode names, encryption salt and extended times
+RAR4_MODERN_FILE_FLAGS = 0x0200 | 0x0400 | 0x1000
+
+def _rar4_crc_checked(header_type, flags, modern):
+    """
+    RAR 1.5 to 2.x leave inline comments and their subblocks out of the header CRC, so only the headers
+    of RAR 2.9 and later are checked. Header types this walk does not know are left to the extractor.
+    """
+    if header_type == 0x73:
+        # An inline archive comment only exists in the old format
+        return not flags & 0x0002
+    if header_type in (0x74, 0x7A, 0x7B):
+        return modern
+    return False
+
+def _validate_rar4(f, size):
+    pos = 7
+    # RAR 2.9 and later always end an archive with an end block, older versions may simply stop
+    modern = False
+    while pos < size:
+        f.seek(pos)
+        head = f.read(7)
+        if len(head) < 7:
+            return "ends inside a header"
+        crc, header_type, flags, header_size = struct.unpack("<HBHH", head)
+        block = head + f.read(max(0, header_size - 7))
+        if header_size < 7 or len(block) < header_size:
+            return "ends inside a header"
+        if header_type == 0x74:
+            modern = modern or bool(flags & RAR4_MODERN_FILE_FLAGS) or (header_size > 24 and block[24] >= 29)
+        elif header_type == 0x7A:
+            modern = True
+        if _rar4_crc_checked(header_type, flags, modern) and zlib.crc32(block[2:]) & 0xFFFF != crc:
+            return f"has a damaged header at byte {pos}"
+        data_size = 0
+        if flags & 0x8000 and header_size >= 11:
+            data_size = struct.unpack("<I", block[7:11])[0]
+            if header_type == 0x74 and flags & 0x0100 and header_size >= 36:
+                data_size |= struct.unpack("<I", block[32:36])[0] << 32
+        if header_type == 0x73 and flags & 0x0080:
+            return None
+        if header_type == 0x7B:
+            return "is one volume of a multi part archive" if flags & 0x0001 else None
+        pos += header_size + data_size
+    if modern:
+        return "ends before its end of archive marker"
+    # Archives of old RAR versions may end without a marker, their last file still has to end at the end
+    return "ends inside a packed file" if pos > size else None
+
+def _validate_zip(path, size):
+    try:
+        with zipfile.ZipFile(path) as archive:
+            entries = archive.infolist()
+    except (zipfile.BadZipFile, OSError) as e:
+        return f"has no readable central directory ({e})"
+    for entry in entries:
+        if entry.header_offset + 30 + len(entry.orig_filename) + entry.compress_size > size:
+            return f"ends inside {entry.filename}"
+    return None
+
+def _validate_7z(f, size):
+    f.seek(0)
+    head = f.read(32)
+    if len(head) < 32:
+        return "ends inside its signature header"
+    if zlib.crc32(head[12:32]) != struct.unpack("<I", head[8:12])[0]:
+        return "has a damaged signature header"
+    offset, length = struct.unpack("<QQ", head[12:28])
+    return "ends before its header" if 32 + offset + length > size else None
+
+def validate_archive(path, expected_size=None):
+    """
+    Walks the headers and the end marker of the archive without unpacking anything. Returns why the archive
+    can not be unpacked or None, a damaged or truncated archive is caught in milliseconds this way.
+    """
+    size = os.path.getsize(path)
+    if expected_size is not None and size != expected_size:
+        return f"has {size} of {expected_size} bytes"
+
+    kind = archive_type(path)
+    if kind is None:
+        return "is no rar, zip or 7z archive"
+    if kind == "zip":
+        return _validate_zip(path, size)
+    try:
+        with open(path, "rb") as f:
+            if kind == "7z":
+                return _validate_7z(f, size)
+            if f.read(8).startswith(ARCHIVE_SIGNATURES["rar"][1]):
+                return _validate_rar5(f, size)
+            return _validate_rar4(f, size)
+    except ValueError as e:
+        return f"has a damaged header ({e})"
+
+def _entry_key(name):
+    return name.replace("\\", "/").strip("/")
+
+class Extractor(abc.ABC):
+    """
+    One command line extraction tool. The archive is listed first, so the names the tool prints while it
+    extracts can be counted as files and bytes for the progress callback.
+    """
+    name = None
+    executables = ()
+    formats = ()
+
+    def __init__(self, executable):
+        self.executable = executable
+        self.process = None
+        self._cancelled = False
+
+    @classmethod
+    def locate(cls):
+        """Path of the tool, a copy in the Tools folder wins over one on PATH."""
+        for executable in cls.executables:
+            bundled = os.path.join(TOOLS_FOLDER, executable)
+            if os.path.isfile(bundled):
+                return bundled
+            found = shutil.which(executable)
+            if found:
+                return found
+        return None
+
+    @abc.abstractmethod
+    def list_command(self, archive):
+        """Command line that lists the content of archive with the size of every entry."""
+
+    @abc.abstractmethod
+    def parse_listing(self, lines):
+        """Size of every file in the archive by its path, folders are left out."""
+
+    @abc.abstractmethod
+    def extract_command(self, archive, destination):
+        """Command line that unpacks archive into destination and prints every entry it extracted."""
+
+    @abc.abstractmethod
+    def extracted_name(self, line):
+        """Path of the entry a line of the extraction output reports as done, None for any other line."""
+
+    def list(self, archive):
+        try:
+            result = subprocess.run(self.list_command(archive), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+        except OSError as e:
+            logging.warning(f"{self.name}: Listing {archive} failed: {e}")
+            return {}
+        if result.returncode != 0:
+            logging.warning(f"{self.name}: Listing {archive} failed with code {result.returncode}")
+            return {}
+        return {_entry_key(name): size for name, size in self.parse_listing(result.stdout.splitlines()).items()}
+
+    def extract(self, archive, destination, progress=None):
+        """
+        Unpacks archive into destination and reports progress(done_bytes, done_files, total_bytes, total_files)
+        after every file. Returns True when the tool succeeded and was not cancelled.
+        """
+        entries = self.list(archive)
+        total_bytes = sum(entries.values())
+        done_bytes = done_files = 0
+        if progress:
+            progress(0, 0, total_bytes, len(entries))
+
+        self.process = subprocess.Popen(self.extract_command(archive, destination),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1
+        )
+        # A cancel that came in while the tool was starting
+        if self._cancelled:
+            self.process.terminate()
+
+        for line in self.process.stdout:
+            logging.debug(line.strip())
+            name = self.extracted_name(line.strip())
+            if name is None:
+                continue
+            key = _entry_key(name)
+            if entries and key not in entries:
+                continue
+            done_files += 1
+            done_bytes += entries.get(key, 0)
+            if progress:
+                progress(done_bytes, done_files, total_bytes, len(entries))
+
+        self.process.wait()
+        logging.debug(f"{self.name}: Finished with code {self.process.returncode}")
+        return self.process.returncode == 0 and not self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+class UnrarExtractor(Extractor):
+    name = "unrar"
+    executables = ("UnRAR.exe", "unrar")
+    formats = ("rar",)
+
+    def list_command(self, archive):
+        return [self.executable, "lt", "-y", archive]
+
+    def parse_listing(self, lines):
+        entries, name, is_file = {}, None, True
+        for line in lines:
+            key, _, value = line.strip().partition(": ")
+            if key == "Name":
+                name, is_file = value, True
+            elif key == "Type":
+                is_file = value == "File"
+            elif key == "Size" and name and is_file and value.isdigit():
+                entries[name] = int(value)
+        return entries
+
+    def extract_command(self, archive, destination):
+        return [self.executable, "x", "-y", archive, os.path.join(destination, "")]
+
+    def extracted_name(self, line):
+        # The percentage of a large file is redrawn with backspaces on the same line until it ends with OK
+        match = re.match(r"Extracting\s+(.+?)\s+[\d%\x08\s]*OK$", line)
+        return match.group(1) if match else None
+
+class SevenZipExtractor(Extractor):
+    name = "7z"
+    executables = ("7z.exe", "7z", "7zz")
+    formats = ("rar", "zip", "7z")
+
+    def list_command(self, archive):
+        return [self.executable, "l", "-slt", archive]
+
+    def parse_listing(self, lines):
+        entries, entry, started = {}, {}, False
+        for line in lines + [""]:
+            if line.strip() == "----------":
+                started = True
+            elif started and not line.strip():
+                if "Path" in entry and entry.get("Folder") != "+" and not entry.get("Attributes", "").startswith("D") and entry.get("Size", "").isdigit():
+                    entries[entry["Path"]] = int(entry["Size"])
+                entry = {}
+            elif started:
+                key, _, value = line.partition(" = ")
+                entry[key.strip()] = value.strip()
+        return entries
+
+    def extract_command(self, archive, destination):
+        return [self.executable, "x", "-y", "-bb1", "-bsp0", f"-o{destination}", archive]
+
+    def extracted_name(self, line):
+        return line[2:] if line.startswith("- ") else None
+
+class BsdtarExtractor(Extractor):
+    """libarchive's tar, Windows ships it as tar.exe while the tar of Linux is GNU tar without rar support."""
+    name = "bsdtar"
+    executables = ("bsdtar.exe", "tar.exe") if os.name == "nt" else ("bsdtar",)
+    formats = ("rar", "zip", "7z")
+
+    def list_command(self, archive):
+        return [self.executable, "-tvf", archive]
+
+    def parse_listing(self, lines):
+        entries = {}
+        for line in lines:
+            # -rw-r--r--  0 user group  1234 Jan  1  2020 path
+            parts = line.split(None, 8)
+            if len(parts) == 9 and parts[0].startswith("-") and parts[4].isdigit():
+                entries[parts[8]] = int(parts[4])
+        return entries
+
+    def extract_command(self, archive, destination):
+        return [self.executable, "-xvf", archive, "-C", destination]
+
+    def extracted_name(self, line):
+        return line[2:] if line.startswith("x ") else None
+
+EXTRACTORS = (UnrarExtractor, SevenZipExtractor, BsdtarExtractor)
+
+def find_extractor(archive, preferred="auto"):
+    """First installed backend that reads the format of archive, a preferred backend is asked first."""
+    kind = archive_type(archive) or "rar"
+    for backend in sorted(EXTRACTORS, key=lambda backend: backend.name != preferred):
+        if kind not in backend.formats:
+            continue
+        executable = backend.locate()
+        if executable:
+            return backend(executable)
+    return None
@@ -102,7 +102,7 @@ class File:
 class UserConfig:
     def __init__(self, in_path, filename, quite=False):
         
-        default_data = {"install_commen_redist": True, "shutil_move_error_replace": True, "search": {"games": True, "movies": False, "series": False}, "start_up_update": True, "speed": 0, "excluded": False, "exclude_message": True}
+        default_data = {"install_commen_redist": True, "shutil_move_error_replace": True, "search": {"games": True, "movies": False, "series": False}, "start_up_update": True, "speed": 0, "max_downloads": 3, "max_connections": 16, "race_providers": False, "multi_source": False, "extractor": "auto", "excluded": False, "exclude_message": True}
         
         File.check_existence(in_path, filename, add_conten=default_data, use_json=True, quite=quite)
         
@@ -134,6 +134,11 @@ class UserConfig:
         self.UPDATE_ON_STARTUP_ONLY = self._data["start_up_update"]
         
         self.DOWNLOAD_SPEED = self._data["speed"]
+        self.MAX_DOWNLOADS = self._data["max_downloads"]
+        self.MAX_CONNECTIONS = self._data["max_connections"]
+        self.RACE_PROVIDERS = self._data["race_providers"]
+        self.MULTI_SOURCE = self._data["multi_source"]
+        self.EXTRACTOR = self._data["extractor"]
         
         self.EXCLUDE_MESSAGE = self._data["exclude_message"]
         self.EXCLUDED = self._data["excluded"]
@@ -146,6 +151,11 @@ class UserConfig:
         self._data["search"]["series"] = self.SEARCH_SERIES
         self._data["start_up_update"] = self.UPDATE_ON_STARTUP_ONLY
         self._data["speed"] = self.DOWNLOAD_SPEED
+        self._data["max_downloads"] = self.MAX_DOWNLOADS
+        self._data["max_connections"] = self.MAX_CONNECTIONS
+        self._data["race_providers"] = self.RACE_PROVIDERS
+        self._data["multi_source"] = self.MULTI_SOURCE
+        self._data["extractor"] = self.EXTRACTOR
         self._data["exclude_message"] = self.EXCLUDE_MESSAGE
         self._data["excluded"] = self.EXCLUDED
         
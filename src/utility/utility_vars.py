@@ -1,6 +1,7 @@
 import os
 
-APPDATA_CACHE_PATH = os.path.join(os.getenv('APPDATA'), "SyntaxRipper")
+# APPDATA only exists on Windows, Linux keeps application data in the XDG data folder
+APPDATA_CACHE_PATH = os.path.join(os.getenv('APPDATA') or os.getenv('XDG_DATA_HOME') or os.path.join(os.path.expanduser("~"), ".local", "share"), "SyntaxRipper")
 
 CONFIG_FOLDER = os.path.join(APPDATA_CACHE_PATH, "Config")
 CACHE_FOLDER = os.path.join(APPDATA_CACHE_PATH, "Cached")
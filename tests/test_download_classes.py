@@ -0,0 +1,51 @@
+import os
+
+from src.utility.download_classes import ConnectionController, DownloadSource, SegmentScheduler
+
+MB = 1024 * 1024
+
+def _source(tmp_path, target, maximum=2):
+    controller = ConnectionController("example.com", target, maximum=maximum, path=os.path.join(tmp_path, "connections.json"))
+    return DownloadSource("provider", "https://example.com/file.rar", controller=controller)
+
+def test_worker_above_target_waits_while_a_lower_worker_runs(tmp_path):
+    source = _source(tmp_path, 1)
+    source.worker_started(0)
+    source.worker_started(1)
+
+    assert not source.over_target(0)
+    assert source.over_target(1)
+
+def test_waiting_worker_takes_over_the_tail_after_lower_workers_exited(tmp_path):
+    source = _source(tmp_path, 2)
+    scheduler = SegmentScheduler([(0, 4 * MB - 1), (4 * MB, 8 * MB - 1)], 8 * MB, min_split=MB, align=1)
+    source.worker_started(0)
+    source.worker_started(1)
+
+    # Worker 0 finishes its range and finds nothing left to take
+    first = scheduler.next_segment()
+    second = scheduler.next_segment()
+    scheduler.claim(first, first.remaining())
+    scheduler.release(first)
+    source.worker_ended(0)
+
+    # Throughput falls at the tail, the target drops below worker 1 which hands its range back
+    source.controller.target = 1
+    scheduler.claim(second, MB)
+    scheduler.release(second)
+
+    assert scheduler.has_work()
+    assert not source.over_target(1)
+    assert scheduler.next_segment() is second
+
+def test_source_fails_only_with_its_last_worker(tmp_path):
+    source = _source(tmp_path, 1)
+    source.worker_started(0)
+    source.worker_started(1)
+
+    source.worker_ended(0, failed=True)
+    assert not source.failed
+    assert not source.over_target(1)
+
+    source.worker_ended(1, failed=True)
+    assert source.failed
@@ -0,0 +1,45 @@
+import os, shutil
+
+import pytest
+
+from src.utility.extract_classes import validate_archive
+
+# Sample archives from the rarfile test suite, see files/LICENSE.rarfile
+FILES = os.path.join(os.path.dirname(__file__), "files")
+OLD_RAR = ["rar15-comment.rar", "rar202-comment-nopsw.rar", "rar202-comment-psw.rar", "rar2-unix-owner.rar"]
+RAR3 = ["rar3-solid.rar", "rar3-subdirs.rar", "rar3-comment-plain.rar", "seektest.rar", "unicode.rar"]
+
+def _copy(tmp_path, name, cut=0):
+    path = os.path.join(tmp_path, name)
+    shutil.copyfile(os.path.join(FILES, name), path)
+    if cut:
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - cut)
+    return path
+
+@pytest.mark.parametrize("name", OLD_RAR + RAR3 + ["rar5-solid.rar"])
+def test_valid_archives_pass(name):
+    path = os.path.join(FILES, name)
+    assert validate_archive(path) is None
+    assert validate_archive(path, os.path.getsize(path)) is None
+
+@pytest.mark.parametrize("name", RAR3)
+def test_rar3_without_end_marker_is_rejected(tmp_path, name):
+    assert validate_archive(_copy(tmp_path, name, cut=7)) == "ends before its end of archive marker"
+
+@pytest.mark.parametrize("name", RAR3 + ["rar5-solid.rar"])
+def test_truncated_archives_are_rejected(tmp_path, name):
+    assert validate_archive(_copy(tmp_path, name, cut=20)) is not None
+
+def test_old_rar_cut_inside_a_packed_file_is_rejected(tmp_path):
+    assert validate_archive(_copy(tmp_path, "rar2-unix-owner.rar", cut=1)) is not None
+
+def test_damaged_rar3_header_is_rejected(tmp_path):
+    path = _copy(tmp_path, "rar3-solid.rar")
+    with open(path, "r+b") as f:
+        # A byte of the file name in the first file header
+        f.seek(7 + 13 + 32)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    assert validate_archive(path).startswith("has a damaged header")